@@ -0,0 +1,371 @@
+import argparse
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+# --------------------------
+# CONFIG DEFAULTS
+# --------------------------
+DEFAULT_OUT_DIR = "bench_corpus"
+DEFAULT_SCALE = 500          # submissions / transcripts / roster students
+DEFAULT_TURNS = 20           # user+assistant turn pairs per raw transcript
+DEFAULT_LINK_RATIO = 0.3     # share of submission members that carry a link
+DEFAULT_SEED = 1234
+STAGES = ("extract", "split", "roster", "roster_cached", "link")
+
+FIRST = ["Ava", "Liam", "Maya", "Noah", "Zoe", "Ethan", "Priya", "Lucas", "Chloe", "Mateo",
+         "Hana", "Omar", "Grace", "Diego", "Nora", "Kai", "Lena", "Jonah", "Iris", "Felix"]
+LAST = ["Nguyen", "Garcia", "Smith", "Okafor", "Patel", "Kim", "Rossi", "Johnson", "Silva", "Cohen",
+        "Brown", "Haddad", "Muller", "Lopez", "Tanaka", "Walsh", "Reyes", "Novak", "Singh", "Baker"]
+WORDS = ("the break even point is where total revenue equals total cost so I need fixed costs "
+         "divided by contribution margin per unit can you check my numbers for price variable "
+         "cost and volume because I think the answer should be higher than what I got").split()
+
+# --------------------------
+# Synthetic corpus generators
+# --------------------------
+def share_link(rng: random.Random) -> str:
+    host = rng.choice(["chatgpt.com", "chatgpt.com", "chat.openai.com"])
+    sid = "-".join("".join(rng.choice("0123456789abcdef") for _ in range(n)) for n in (8, 4, 4, 4, 12))
+    query = rng.choice(["", "", "", "?model=gpt-4o", "?utm_source=canvas"])
+    return f"https://{host}/share/{sid}{query}"
+
+def sentence(rng: random.Random, lo=6, hi=18) -> str:
+    words = rng.choices(WORDS, k=rng.randint(lo, hi))
+    return " ".join(words).capitalize() + "."
+
+def paragraph(rng: random.Random, n=4) -> str:
+    return " ".join(sentence(rng) for _ in range(n))
+
+def make_html(rng, link):
+    body = "".join(f"<p>{escape(paragraph(rng))}</p>" for _ in range(rng.randint(3, 12)))
+    if link:
+        body += f'<p>My chat: <a href={quoteattr(link)}>{escape(link)}</a></p>'
+    return f"<html><head><title>Submission</title></head><body>{body}</body></html>".encode("utf-8")
+
+def make_txt(rng, link):
+    text = "\n\n".join(paragraph(rng) for _ in range(rng.randint(3, 12)))
+    if link:
+        text += f"\n\nLink: {link}\n"
+    return text.encode("utf-8")
+
+def make_json(rng, link):
+    obj = {"student": rng.choice(FIRST), "answers": [paragraph(rng) for _ in range(rng.randint(2, 6))]}
+    if link:
+        obj["chat_link"] = link
+    return json.dumps(obj).encode("utf-8")
+
+def _zip_bytes(parts: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, xml in parts.items():
+            z.writestr(name, xml)
+    return buf.getvalue()
+
+_RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_DOC_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+def make_docx(rng, link):
+    # Minimal WordprocessingML package: text paragraphs plus an external hyperlink relationship
+    paras = "".join(f"<w:p><w:r><w:t>{escape(paragraph(rng))}</w:t></w:r></w:p>" for _ in range(rng.randint(3, 12)))
+    rels = ""
+    if link:
+        paras += f'<w:p><w:hyperlink r:id="rId9"><w:r><w:t>{escape(link)}</w:t></w:r></w:hyperlink></w:p>'
+        rels = f'<Relationship Id="rId9" Type="{_DOC_REL}/hyperlink" Target={quoteattr(link)} TargetMode="External"/>'
+    return _zip_bytes({
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'),
+        "_rels/.rels": (
+            f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{_RELS_NS}">'
+            f'<Relationship Id="rId1" Type="{_DOC_REL}/officeDocument" Target="word/document.xml"/></Relationships>'),
+        "word/document.xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+            f'xmlns:r="{_DOC_REL}"><w:body>{paras}</w:body></w:document>'),
+        "word/_rels/document.xml.rels": (
+            f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{_RELS_NS}">{rels}</Relationships>'),
+    })
+
+def make_xlsx(rng, link):
+    # Minimal SpreadsheetML package with inline-string cells
+    cells = [paragraph(rng, 1) for _ in range(rng.randint(5, 30))]
+    if link:
+        cells.insert(rng.randrange(len(cells) + 1), link)
+    rows = "".join(
+        f'<row r="{i}"><c r="A{i}" t="inlineStr"><is><t>{escape(c)}</t></is></c></row>'
+        for i, c in enumerate(cells, 1))
+    main_ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    return _zip_bytes({
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'),
+        "_rels/.rels": (
+            f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{_RELS_NS}">'
+            f'<Relationship Id="rId1" Type="{_DOC_REL}/officeDocument" Target="xl/workbook.xml"/></Relationships>'),
+        "xl/workbook.xml": (
+            f'<?xml version="1.0" encoding="UTF-8"?><workbook xmlns="{main_ns}" xmlns:r="{_DOC_REL}">'
+            '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+        "xl/_rels/workbook.xml.rels": (
+            f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{_RELS_NS}">'
+            f'<Relationship Id="rId1" Type="{_DOC_REL}/worksheet" Target="worksheets/sheet1.xml"/></Relationships>'),
+        "xl/worksheets/sheet1.xml": (
+            f'<?xml version="1.0" encoding="UTF-8"?><worksheet xmlns="{main_ns}"><sheetData>{rows}</sheetData></worksheet>'),
+    })
+
+def make_pdf(rng, link):
+    # Single-page PDF with an uncompressed text stream and, optionally, a URI link annotation
+    lines = [sentence(rng) for _ in range(rng.randint(5, 25))]
+    if link:
+        lines.append(link)
+    text_ops = " ".join(f"({ln}) Tj T*" for ln in lines)
+    content = f"BT /F1 10 Tf 12 TL 40 760 Td {text_ops} ET".encode("latin-1")
+    annots = " /Annots [6 0 R]" if link else ""
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+         b"/Resources << /Font << /F1 5 0 R >> >>" + annots.encode() + b" >>"),
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    if link:
+        objs.append(f"<< /Type /Annot /Subtype /Link /Rect [40 40 300 60] /A << /S /URI /URI ({link}) >> >>".encode("latin-1"))
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+MEMBER_MAKERS = {
+    ".html": make_html,
+    ".txt": make_txt,
+    ".json": make_json,
+    ".docx": make_docx,
+    ".xlsx": make_xlsx,
+    ".pdf": make_pdf,
+}
+
+def make_submissions_zip(path: Path, n: int, rng: random.Random, link_ratio=DEFAULT_LINK_RATIO):
+    """Write a submissions ZIP with `n` mixed-format members; return the set of embedded links."""
+    links = set()
+    exts = list(MEMBER_MAKERS)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for i in range(n):
+            ext = exts[i % len(exts)]
+            link = share_link(rng) if rng.random() < link_ratio else None
+            if link:
+                links.add(link)
+            z.writestr(f"submissions/student{i:05d}_attempt{ext}", MEMBER_MAKERS[ext](rng, link))
+    return links
+
+def make_roster(n: int, rng: random.Random):
+    roster = []
+    for i in range(n):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        # suffix keeps names and emails unique at large scales
+        tag = "" if i < len(FIRST) * len(LAST) else str(i)
+        name = f"{first} {last}{tag}"
+        email = f"{first.lower()}.{last.lower()}{i}@university.edu"
+        roster.append({"Name": name, "Email": email, "StudentID": 100000 + i})
+    return roster
+
+def make_transcript(rng: random.Random, turns: int, style: str, intro: str = "") -> str:
+    user_marker, agent_marker = ("You said:", "ChatGPT said:") if style == "said" else ("User:", "Assistant:")
+    lines = []
+    for t in range(turns):
+        lines.append(user_marker)
+        if t == 0 and intro:
+            lines.append(intro)
+        lines.extend(sentence(rng) for _ in range(rng.randint(1, 3)))
+        lines.append(agent_marker)
+        lines.extend(paragraph(rng, 2) for _ in range(rng.randint(2, 6)))
+    return "\n".join(lines) + "\n"
+
+def identity_intro(rng: random.Random, student: dict) -> str:
+    # Mix of exact email, username-only email, misspelled name and no identity at all
+    r = rng.random()
+    if r < 0.4:
+        return f"Name: {student['Name']}\nEmail: {student['Email']}"
+    if r < 0.6:
+        return f"My name is {student['Name']}, {student['Email'].split('@')[0]}@gmail.com"
+    if r < 0.85:
+        name = student["Name"]
+        i = rng.randrange(1, len(name) - 1)
+        return f"My name is {name[:i] + name[i + 1:]}"
+    return ""
+
+def make_transcripts(raw_dir: Path, user_dir: Path, n: int, turns: int, roster, rng: random.Random):
+    import split_user_texts_fixed as sutf
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    user_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        student = rng.choice(roster)
+        style = "said" if i % 2 == 0 else "colon"
+        text = make_transcript(rng, turns, style, identity_intro(rng, student))
+        (raw_dir / f"{i + 1:04d}_transcript.txt").write_text(text, encoding="utf-8")
+        # User-only text exactly as the splitter produces it, so the link stage scans real input
+        (user_dir / f"{i + 1:04d}_transcript_user.txt").write_text(sutf.extract_user_text(text.split("\n")), encoding="utf-8")
+
+def generate(out_dir: Path, scale: int, turns: int, link_ratio: float, seed: int):
+    rng = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    zpath = out_dir / "submissions.zip"
+    links = make_submissions_zip(zpath, scale, rng, link_ratio)
+    roster = make_roster(scale, rng)
+    make_transcripts(out_dir / "transcripts_raw", out_dir / "TXT_users", scale, turns, roster, rng)
+    (out_dir / "roster.json").write_text(json.dumps(roster), encoding="utf-8")
+    print(f"[gen] {zpath}: {scale} member(s), {len(links)} link(s); {scale} transcript(s); {scale} roster row(s)")
+    return roster
+
+# --------------------------
+# Stage runners (each returns (files, bytes) processed)
+# --------------------------
+def stage_extract(out_dir: Path, workers: int):
+    import extract_links_robust as elr
+    zpath = out_dir / "submissions.zip"
+    files = 0
+    for _name, _found in elr.iter_member_links(zpath, workers=workers):
+        files += 1
+    with zipfile.ZipFile(zpath) as z:
+        nbytes = sum(i.file_size for i in z.infolist())
+    return files, nbytes
+
+def stage_split(out_dir: Path, workers: int):
+    import split_user_texts_fixed as sutf
+    paths = sorted((out_dir / "transcripts_raw").glob("*.txt"))
+    # The real splitter: streamed reads, output files and the --workers pool
+    with tempfile.TemporaryDirectory() as tmp:
+        for warning in sutf.split_paths(paths, Path(tmp), workers):
+            if warning:
+                print(f"[WARN] {warning}", file=sys.stderr)
+    return len(paths), sum(p.stat().st_size for p in paths)
+
+def _roster_xlsx(out_dir: Path):
+    import pandas as pd
+    path = out_dir / "roster.xlsx"
+    if not path.exists():
+        roster = json.loads((out_dir / "roster.json").read_text(encoding="utf-8"))
+        pd.DataFrame(roster).to_excel(path, index=False, engine="openpyxl")
+    return path
+
+def stage_roster(out_dir: Path, workers: int):
+    import link_user_transcripts as lut
+    path = _roster_xlsx(out_dir)
+    lut.load_master(path, use_cache=False)
+    return 1, path.stat().st_size
+
+def prepare_roster_cached(out_dir: Path):
+    import link_user_transcripts as lut
+    lut.load_master(_roster_xlsx(out_dir))   # writes the snapshot if missing or stale
+
+def stage_roster_cached(out_dir: Path, workers: int):
+    import link_user_transcripts as lut
+    path = _roster_xlsx(out_dir)
+    lut.load_master(path)
+    return 1, path.stat().st_size
+
+def stage_link(out_dir: Path, workers: int):
+    import link_user_transcripts as lut
+    master_df = lut.load_master(_roster_xlsx(out_dir))[0]
+    files = nbytes = 0
+    for p in sorted((out_dir / "TXT_users").glob("*.txt")):
+        text = p.read_text(encoding="utf-8", errors="ignore")
+        emails, name = lut.extract_email_and_name(text)
+        lut.match_record(emails, name, master_df)
+        files += 1
+        nbytes += len(text.encode("utf-8"))
+    return files, nbytes
+
+STAGE_FUNCS = {"extract": stage_extract, "split": stage_split, "roster": stage_roster,
+               "roster_cached": stage_roster_cached, "link": stage_link}
+# Untimed setup run before a stage
+STAGE_PREPARE = {"roster_cached": prepare_roster_cached}
+
+def run_stage(name: str, out_dir: Path, workers: int, trace_memory: bool):
+    fn = STAGE_FUNCS[name]
+    if name in STAGE_PREPARE:
+        STAGE_PREPARE[name](out_dir)
+    t0 = time.perf_counter()
+    files, nbytes = fn(out_dir, workers)
+    secs = time.perf_counter() - t0
+
+    peak = None
+    if trace_memory:
+        # Separate pass: tracemalloc slows allocation-heavy code and would skew timings
+        tracemalloc.start()
+        fn(out_dir, workers)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "stage": name,
+        "files": files,
+        "bytes": nbytes,
+        "seconds": round(secs, 4),
+        "files_per_sec": round(files / secs, 2) if secs else None,
+        "mb_per_sec": round(nbytes / 1e6 / secs, 3) if secs else None,
+        "peak_mb": round(peak / 1e6, 2) if peak is not None else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transcript tools on a synthetic, offline corpus.")
+    parser.add_argument("--out_dir", default=DEFAULT_OUT_DIR, help="Folder for the generated corpus.")
+    parser.add_argument("--scale", type=int, default=DEFAULT_SCALE, help="Submissions, transcripts and roster rows to generate.")
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURNS, help="Turn pairs per raw transcript.")
+    parser.add_argument("--link_ratio", type=float, default=DEFAULT_LINK_RATIO, help="Fraction of submission members with a share link.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed for the generator.")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated stages to run ({', '.join(STAGES)}).")
+    parser.add_argument("--workers", type=int, default=1, help="Workers passed to stages that support a pool.")
+    parser.add_argument("--reuse", action="store_true", help="Reuse an existing corpus in --out_dir instead of regenerating.")
+    parser.add_argument("--no_memory", action="store_true", help="Skip the tracemalloc peak-memory pass.")
+    parser.add_argument("--json", dest="json_out", default="", help="Also write results as JSON to this file.")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out_dir)
+    if not (args.reuse and (out_dir / "submissions.zip").exists()):
+        generate(out_dir, args.scale, args.turns, args.link_ratio, args.seed)
+
+    results = []
+    for name in [s.strip() for s in args.stages.split(",") if s.strip()]:
+        if name not in STAGE_FUNCS:
+            print(f"[WARN] Unknown stage: {name}", file=sys.stderr)
+            continue
+        try:
+            r = run_stage(name, out_dir, args.workers, not args.no_memory)
+        except ImportError as e:
+            print(f"[WARN] Skipping {name}: missing dependency ({e})", file=sys.stderr)
+            continue
+        results.append(r)
+        peak = f", peak {r['peak_mb']} MB" if r["peak_mb"] is not None else ""
+        print(f"[bench] {name}: {r['files']} file(s), {r['bytes'] / 1e6:.2f} MB in {r['seconds']:.3f}s "
+              f"-> {r['files_per_sec']} files/s, {r['mb_per_sec']} MB/s{peak}")
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"[DONE] Wrote results to: {args.json_out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from transcript_store import TranscriptStore
+from metrics import METRICS, add_arguments as add_metrics_arguments, collect as collect_metrics
+
+# --------------------------
+# CONFIG DEFAULTS
+# --------------------------
+COMBINED_FILE = "combined.jsonl"      # scrape_transcripts.py output
+DUPES_FILE = "duplicates.csv"
+SHINGLE_WORDS = 5                     # words per shingle
+NUM_PERM = 128                        # MinHash signature length
+BANDS = 16                            # LSH bands (NUM_PERM / BANDS rows each)
+DEFAULT_THRESHOLD = 0.85              # word-shingle Jaccard similarity that counts as a copy
+SEED = 1
+HASH_BLOCK = 4096                     # shingles hashed at once (NUM_PERM x HASH_BLOCK uint64 = 4 MB)
+WORD_RE = re.compile(r"\w+")
+DUPES_FIELDS = ["index", "url", "path", "duplicate_of_index", "duplicate_of_url", "duplicate_of_path", "similarity"]
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> np.ndarray:
+    """Distinct 32-bit hashes of the k-word shingles of `text` (case-folded)."""
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    if len(words) < k:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    # crc32 is stable across runs and processes, unlike hash()
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams)))
+
+class MinHasher:
+    """
+    MinHash signatures over 32-bit shingle hashes, using NUM_PERM
+    multiply-add-shift hashes ((a*x + b) mod 2**64) >> 32 with random 64-bit
+    a (odd) and b. uint64 arithmetic wraps mod 2**64, so this is exact.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(0, 1 << 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 1 << 64, size=num_perm, dtype=np.uint64)
+
+    def signature(self, x: np.ndarray):
+        """Signature array for the shingle hashes `x` (from shingles()), or None if empty."""
+        if not x.size:
+            return None
+        # Running minimum over fixed-size blocks, so long transcripts never
+        # need a num_perm x shingles matrix; every hash is below 2**32
+        sig = np.full(self.a.size, 1 << 32, dtype=np.uint64)
+        b = self.b[:, None]
+        for start in range(0, x.size, HASH_BLOCK):
+            h = np.outer(self.a, x[start:start + HASH_BLOCK])
+            h += b
+            h >>= np.uint64(32)
+            np.minimum(sig, h.min(axis=1), out=sig)
+        return sig
+
+def jaccard(x: np.ndarray, y: np.ndarray) -> float:
+    """Exact Jaccard similarity of two shingle-hash sets (sorted, distinct, as shingles() returns)."""
+    inter = np.intersect1d(x, y, assume_unique=True).size
+    return inter / (x.size + y.size - inter)
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate check: check_add(key, text) returns (key, similarity)
+    of an earlier near-copy, or None after remembering `text` as a new original.
+    LSH bands over the MinHash signatures pick the candidates; the exact
+    Jaccard similarity of the shingle sets decides.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = SEED):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, seed)
+        self.buckets = [dict() for _ in range(bands)]
+        self.shingles = {}
+
+    def check_add(self, key, text: str):
+        x = shingles(text)
+        sig = self.hasher.signature(x)
+        if sig is None:
+            return None
+        bands = [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(len(self.buckets))]
+        best = None
+        seen = set()
+        for bucket, band in zip(self.buckets, bands):
+            for other in bucket.get(band, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                sim = jaccard(self.shingles[other], x)
+                if sim >= self.threshold and (best is None or sim > best[1]):
+                    best = (other, sim)
+        if best is not None:
+            return best
+        self.shingles[key] = x
+        for bucket, band in zip(self.buckets, bands):
+            bucket.setdefault(band, []).append(key)
+        return None
+
+# --------------------------
+# Batch mode: scan scraped transcripts, write duplicates.csv
+# --------------------------
+def iter_combined(path: Path):
+    """(index, url, path, text) per combined.jsonl row, in index order."""
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            rows.append((row.get("index", 0), row.get("url", ""), row.get("path", ""), row.get("text", "")))
+    return sorted(rows, key=lambda r: r[0])
+
+def iter_stored(store: TranscriptStore):
+    rows = store.db.execute("SELECT idx, url, path, raw_text FROM transcripts ORDER BY idx").fetchall()
+    return [(i, u, p, t or "") for i, u, p, t in rows]
+
+def find_duplicates(rows, threshold: float = DEFAULT_THRESHOLD):
+    """
+    rows: (index, url, path, text) in index order. Returns one dict per
+    duplicate (DUPES_FIELDS); the earliest transcript of each group is kept.
+    """
+    index = NearDuplicateIndex(threshold)
+    by_key = {}
+    dupes = []
+    for i, url, path, text in rows:
+        with METRICS.timer("dedupe.check"):
+            hit = index.check_add(i, text)
+        if hit is None:
+            by_key[i] = (url, path)
+            continue
+        orig, sim = hit
+        dupes.append({"index": i, "url": url, "path": path, "duplicate_of_index": orig,
+                      "duplicate_of_url": by_key[orig][0], "duplicate_of_path": by_key[orig][1],
+                      "similarity": round(sim, 4)})
+    return dupes
+
+def write_duplicates(path: Path, dupes):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=DUPES_FIELDS, lineterminator=os.linesep)
+        w.writeheader()
+        w.writerows(dupes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag scraped transcripts that are near-copies of an earlier one (MinHash + LSH).")
+    parser.add_argument("--combined", default=COMBINED_FILE, help="combined.jsonl written by scrape_transcripts.py.")
+    parser.add_argument("--store", default="", metavar="DB", help="Read transcripts from a transcript_store.py database instead.")
+    parser.add_argument("--out", default=DUPES_FILE, help="CSV listing each duplicate and the transcript it copies.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Word-shingle Jaccard similarity at or above which two transcripts are copies.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    src = Path(args.store or args.combined)
+    if not src.exists():
+        print(f"[ERROR] Not found: {src}", file=sys.stderr)
+        sys.exit(1)
+
+    with collect_metrics(args, "dedupe_transcripts"):
+        with METRICS.timer("dedupe.total"):
+            if args.store:
+                with TranscriptStore(src) as store:
+                    rows = iter_stored(store)
+            else:
+                rows = iter_combined(src)
+            dupes = find_duplicates(rows, args.threshold)
+        write_duplicates(Path(args.out), dupes)
+        METRICS.count("dedupe.transcripts", len(rows))
+        METRICS.count("dedupe.duplicates", len(dupes))
+
+    print(f"[DONE] {len(dupes)} of {len(rows)} transcript(s) are near-copies of an earlier one; wrote {args.out}")
+    if dupes:
+        print(f"[NOTE] split_user_texts_fixed.py --skip_duplicates {args.out} leaves them out of TXT_users")
+
+if __name__ == "__main__":
+    main()
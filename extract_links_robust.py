@@ -1,15 +1,54 @@
 import re, zipfile, io, json
+import argparse
+import codecs
+import csv
+import importlib.util
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from bs4 import BeautifulSoup
+from metrics import METRICS, timed, add_arguments as add_metrics_arguments, collect as collect_metrics
 
 # ---- CONFIG ----
 ZIP_FILE = "submissions (breakeven).zip"   # <-- change to your actual zip filename
 OUT_FILE = "urls.txt"
 # Accept both chat.openai.com and chatgpt.com share links (with optional query parts)
-PATTERN = re.compile(r"https?://(chat\.openai\.com|chatgpt\.com)/share/[A-Za-z0-9\-_]+(?:\?[^\s\"'<>]*)?", re.I)
+PATTERN = re.compile(r"https?://(chat\.openai\.com|chatgpt\.com)/share/(?P<id>[A-Za-z0-9\-_]+)(?:\?[^\s\"'<>]*)?", re.I)
+
+# Share links are written as https://CANONICAL_HOST/share/<id>: chat.openai.com
+# links redirect there, and query strings do not change the conversation
+CANONICAL_HOST = "chatgpt.com"
+UUID_RE = re.compile(r"^[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}$", re.I)
+# Every submitting file for each canonical URL (url, source_file, found_as)
+SOURCES_FILE = "url_sources.csv"
 
 # Optional: list what we found per file
 VERBOSE = True
+# Number of worker processes for --workers (1 = scan in this process)
+DEFAULT_WORKERS = 1
+# Members larger than this (uncompressed) are skipped instead of loaded
+DEFAULT_MAX_MEMBER_MB = 64
+# How deep to descend into .zip files inside the submissions ZIP
+DEFAULT_MAX_DEPTH = 3
+# Plain-text members are scanned in chunks of this size
+STREAM_CHUNK = 1 << 20
+# Characters carried between chunks so a link split across a boundary is still found
+URL_OVERLAP = 2048
+
+# Cheap byte-level prefilter: no PATTERN match is possible without one of these domains
+DOMAIN_BYTES = re.compile(rb"chat\.openai\.com|chatgpt\.com", re.I)
+XML_TAG = re.compile(rb"<[^>]*>")
+# Only the OOXML parts the docx/xlsx extractors actually read
+DOCX_PARTS = ("word/document.xml", "word/_rels/document.xml.rels")
+XLSX_PARTS = ("xl/sharedStrings.xml", "xl/worksheets/")
+
+# Incremental cache of per-member results, keyed by name + CRC32 + size from ZipInfo
+CACHE_FILE = "urls_cache.json"
+CACHE_VERSION = 1
+# Entries not used by any run for this many days are evicted on save
+DEFAULT_CACHE_MAX_AGE_DAYS = 30
 
 def try_decode(data: bytes):
     for enc in ("utf-8", "utf-16", "latin-1"):
@@ -19,6 +58,34 @@ def try_decode(data: bytes):
             continue
     return ""
 
+def _as_file(data):
+    # Parsers below accept either raw bytes or an already-open seekable handle
+    return data if hasattr(data, "read") else io.BytesIO(data)
+
+def may_contain_link(data: bytes) -> bool:
+    return DOMAIN_BYTES.search(data) is not None
+
+def ooxml_may_contain_link(fh, parts) -> bool:
+    """
+    Peek inside a docx/xlsx container and check only the XML parts the parser
+    would read. Tags are stripped as well, since Word/Excel can split one URL
+    across several text runs. Leaves `fh` rewound for the real parser.
+    """
+    try:
+        with zipfile.ZipFile(fh, "r") as inner:
+            for name in inner.namelist():
+                if not (name in parts or any(p.endswith("/") and name.startswith(p) for p in parts)):
+                    continue
+                xml = inner.read(name)
+                if may_contain_link(xml) or may_contain_link(XML_TAG.sub(b"", xml)):
+                    return True
+        return False
+    except Exception:
+        # Not a readable container: let the real parser decide
+        return True
+    finally:
+        fh.seek(0)
+
 def extract_from_html(text: str):
     urls = set(PATTERN.findall(text))  # Find domain groups only; fix below
     # Correct the above: re.findall returns tuples when groups present, so re-run plain finditer:
@@ -42,7 +109,7 @@ def extract_from_docx_bytes(data: bytes):
     except ImportError:
         return set()
     urls = set()
-    f = io.BytesIO(data)
+    f = _as_file(data)
     doc = Document(f)
     # Text content
     for p in doc.paragraphs:
@@ -71,7 +138,7 @@ def extract_from_xlsx_bytes(data: bytes):
     except ImportError:
         return set()
     urls = set()
-    f = io.BytesIO(data)
+    f = _as_file(data)
     wb = load_workbook(f, data_only=True, read_only=True)
     for ws in wb.worksheets:
         for row in ws.iter_rows(values_only=True):
@@ -88,8 +155,8 @@ def extract_from_pdf_bytes(data: bytes):
         return set()
     urls = set()
     try:
-        reader = PdfReader(io.BytesIO(data))
-        # Text
+        reader = PdfReader(_as_file(data))
+        # One pass over the pages: text, then annotations / links
         for page in reader.pages:
             try:
                 txt = page.extract_text() or ""
@@ -97,8 +164,6 @@ def extract_from_pdf_bytes(data: bytes):
                     urls |= extract_from_html(txt)
             except Exception:
                 pass
-        # Annotations / links
-        for page in reader.pages:
             annots = page.get("/Annots", [])
             for a in annots or []:
                 try:
@@ -132,64 +197,309 @@ def extract_from_json_text(text: str):
         pass
     return urls
 
+def extract_from_stream(fh):
+    """
+    Regex-scan a binary stream chunk by chunk (decoded as UTF-8) without
+    holding the whole member in memory.
+    """
+    urls = set()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    tail = ""
+    while True:
+        chunk = fh.read(STREAM_CHUNK)
+        final = not chunk
+        text = tail + decoder.decode(chunk, final=final)
+        keep_from = max(0, len(text) - URL_OVERLAP)
+        for m in PATTERN.finditer(text):
+            # A match touching the end of the buffer may continue in the next chunk
+            if m.end() == len(text) and not final:
+                keep_from = max(min(keep_from, m.start()), len(text) - URL_OVERLAP - STREAM_CHUNK)
+                continue
+            urls.add(m.group(0))
+        if final:
+            return urls
+        tail = text[keep_from:]
+
+def extract_from_member(name: str, fh):
+    """
+    Dispatch one opened member to the parser for its extension.
+    `fh` must be seekable for docx/xlsx/pdf (see open_seekable).
+    """
+    ext = Path(name).suffix.lower()
+    found = set()
+
+    # Prefilters skip the expensive parsers when no share link can be present
+    if ext in {".html", ".htm"}:
+        data = fh.read()
+        if may_contain_link(data):
+            found |= extract_from_html_bs(try_decode(data))
+    elif ext in {".txt", ".md", ".csv"}:
+        found |= extract_from_stream(fh)
+    elif ext == ".docx":
+        if ooxml_may_contain_link(fh, DOCX_PARTS):
+            found |= extract_from_docx_bytes(fh)
+    elif ext in {".xlsx", ".xlsm"}:
+        if ooxml_may_contain_link(fh, XLSX_PARTS):
+            found |= extract_from_xlsx_bytes(fh)
+    elif ext == ".pdf":
+        # PDF text usually sits in compressed content streams, so there is no
+        # safe byte-level prefilter; the extractor makes a single page pass
+        found |= extract_from_pdf_bytes(fh)
+    elif ext in {".json", ".ndjson", ".jsonl"}:
+        data = fh.read()
+        if may_contain_link(data):
+            found |= extract_from_json_text(try_decode(data))
+    elif ext in {".url"}:
+        # Windows InternetShortcut files are INI-like
+        found |= extract_from_stream(fh)
+    else:
+        # Fallback: try plain decode + regex
+        found |= extract_from_stream(fh)
+
+    return found
+
+def member_infos(z: zipfile.ZipFile):
+    # skip directories
+    return [i for i in z.infolist() if not (i.filename.endswith("/") or i.filename.endswith("\\"))]
+
+def open_seekable(z: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """
+    Stored members seek cheaply straight from the archive; compressed ones would
+    re-inflate from the start on every backward seek, so buffer those in memory
+    (bounded by the member size cap).
+    """
+    if info.compress_type == zipfile.ZIP_STORED:
+        return z.open(info)
+    with z.open(info) as fh:
+        return io.BytesIO(fh.read())
+
+def scan_member(z: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int, max_depth: int = DEFAULT_MAX_DEPTH, prefix: str = ""):
+    """
+    Return [(display_name, links), ...] for one member. Nested .zip members
+    are opened in memory and expand to one entry per inner file.
+    """
+    name = prefix + info.filename
+    if max_bytes and info.file_size > max_bytes:
+        if VERBOSE:
+            print(f"[skip] {name}: {info.file_size} bytes exceeds member size cap")
+        return []
+
+    ext = Path(info.filename).suffix.lower()
+    try:
+        if ext == ".zip":
+            if max_depth <= 0:
+                return []
+            results = []
+            with zipfile.ZipFile(open_seekable(z, info), "r") as inner:
+                for sub in member_infos(inner):
+                    results.extend(scan_member(inner, sub, max_bytes, max_depth - 1, prefix=name + "/"))
+            return results
+
+        if ext in {".docx", ".xlsx", ".xlsm", ".pdf"}:
+            fh = open_seekable(z, info)
+        else:
+            fh = z.open(info)
+        with fh:
+            return [(name, extract_from_member(info.filename, fh))]
+    except Exception:
+        return [(name, set())]
+
+# --------------------------
+# Process pool: each worker opens the archive once on its own
+# --------------------------
+_worker_zip = None
+_worker_limits = (0, DEFAULT_MAX_DEPTH)
+
+def _init_worker(zip_path: str, max_bytes: int, max_depth: int):
+    global _worker_zip, _worker_limits
+    _worker_zip = zipfile.ZipFile(zip_path, "r")
+    _worker_limits = (max_bytes, max_depth)
+
+def _scan_in_worker(name: str):
+    max_bytes, max_depth = _worker_limits
+    return timed(scan_member, _worker_zip, _worker_zip.getinfo(name), max_bytes, max_depth)
+
+# --------------------------
+# Incremental cache
+# --------------------------
+def cache_key(info: zipfile.ZipInfo) -> str:
+    return f"{info.filename}|{info.CRC:08x}|{info.file_size}"
+
+def cache_settings(max_bytes: int, max_depth: int) -> dict:
+    # Anything that changes what a member yields invalidates the whole cache,
+    # including which optional parsers are installed.
+    parsers = [m for m in ("docx", "openpyxl", "pypdf") if importlib.util.find_spec(m) is not None]
+    return {"version": CACHE_VERSION, "pattern": PATTERN.pattern, "max_bytes": max_bytes,
+            "max_depth": max_depth, "parsers": parsers}
+
+def load_cache(path: Path, settings: dict) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        obj = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if obj.get("settings") != settings:
+        if VERBOSE:
+            print(f"[cache] settings changed, ignoring {path}")
+        return {}
+    return obj.get("entries", {})
+
+def save_cache(path: Path, cache: dict, settings: dict, max_age_days: float = DEFAULT_CACHE_MAX_AGE_DAYS):
+    cutoff = time.time() - max_age_days * 86400
+    entries = {k: v for k, v in cache.items() if v.get("used", 0) >= cutoff}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"settings": settings, "entries": entries}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    return len(cache) - len(entries)
+
+def iter_member_links(zpath: Path, workers: int = 1, max_bytes: int = DEFAULT_MAX_MEMBER_MB << 20,
+                      max_depth: int = DEFAULT_MAX_DEPTH, cache: dict = None):
+    """
+    Yield (member_name, links) for every file in the ZIP, in archive order.
+    With workers > 1 the members are parsed in a process pool.
+    If `cache` is given, unchanged members are served from it and new results
+    are stored back into it.
+    """
+    now = time.time()
+    with zipfile.ZipFile(zpath, "r") as z:
+        infos = member_infos(z)
+        misses = [i for i in infos if cache is None or cache_key(i) not in cache]
+        if VERBOSE and cache is not None:
+            print(f"[cache] {len(infos) - len(misses)} cached, {len(misses)} to parse")
+
+        if workers <= 1 or not misses:
+            parsed = (timed(scan_member, z, info, max_bytes, max_depth) for info in misses)
+            yield from _merge_cached(infos, parsed, cache, now)
+            return
+
+    names = [i.filename for i in misses]
+    chunksize = max(1, min(32, len(names) // (workers * 4) or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(zpath), max_bytes, max_depth)) as pool:
+        # map() returns results in submission order, so output stays deterministic
+        parsed = pool.map(_scan_in_worker, names, chunksize=chunksize)
+        yield from _merge_cached(infos, parsed, cache, now)
+
+def _merge_cached(infos, parsed, cache, now):
+    # `parsed` yields (results, seconds) for the cache misses, in the same order as `infos`
+    parsed = iter(parsed)
+    for info in infos:
+        METRICS.count("extract.members")
+        key = cache_key(info)
+        if cache is not None and key in cache:
+            METRICS.count("extract.cache_hits")
+            entry = cache[key]
+            entry["used"] = now
+            for name, links in entry["results"]:
+                yield name, set(links)
+            continue
+        results, secs = next(parsed)
+        # Per-extension stages show whether e.g. PDFs dominate the run
+        METRICS.add_time(f"extract.parse{Path(info.filename).suffix.lower() or '.noext'}", secs, key=info.filename)
+        METRICS.count("extract.bytes_parsed", info.file_size)
+        if cache is not None:
+            cache[key] = {"results": [[n, sorted(l)] for n, l in results], "used": now}
+        yield from results
+
+# --------------------------
+# Canonical share URLs
+# --------------------------
+def canonical_url(url: str):
+    """
+    One spelling per shared conversation: https scheme, CANONICAL_HOST, no
+    query, fragment or trailing path. UUID share IDs are case-insensitive and
+    get lowercased; other IDs are kept as written. `url` may be any string
+    holding a share link (e.g. a whole JSON value); None if it holds none.
+
+    >>> canonical_url("http://chat.openai.com/share/abc-1?model=gpt-4")
+    'https://chatgpt.com/share/abc-1'
+    >>> canonical_url("https://chatgpt.com/share/abc/continue")
+    'https://chatgpt.com/share/abc'
+    >>> canonical_url("https://chatgpt.com/share/abc#top")
+    'https://chatgpt.com/share/abc'
+    >>> canonical_url("See https://chatgpt.com/share/abc thanks")
+    'https://chatgpt.com/share/abc'
+    >>> canonical_url("https://chatgpt.com/share/6E0A3F52-1B2C-4D5E-8F90-A1B2C3D4E5F6")
+    'https://chatgpt.com/share/6e0a3f52-1b2c-4d5e-8f90-a1b2c3d4e5f6'
+    >>> canonical_url("https://example.com/share/abc") is None
+    True
+    """
+    m = PATTERN.search(url)
+    if m is None:
+        return None
+    share_id = m.group("id")
+    if UUID_RE.match(share_id):
+        share_id = share_id.lower()
+    return f"https://{CANONICAL_HOST}/share/{share_id}"
+
+def write_sources(path: Path, sources: dict):
+    """sources: {canonical_url: {(member_name, url_as_found), ...}} -> one CSV row per pair."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator=os.linesep)
+        w.writerow(["url", "source_file", "found_as"])
+        for url in sorted(sources):
+            for name, raw in sorted(sources[url]):
+                w.writerow([url, name, raw])
+
 def main():
-    zpath = Path(ZIP_FILE)
+    parser = argparse.ArgumentParser(description="Extract ChatGPT share links from a submissions ZIP.")
+    parser.add_argument("--zip", default=ZIP_FILE, help="Submissions ZIP file.")
+    parser.add_argument("--out", default=OUT_FILE, help="Output file with one URL per line.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes for parsing members (default: 1).")
+    parser.add_argument("--max_member_mb", type=float, default=DEFAULT_MAX_MEMBER_MB, help="Skip members larger than this many MB uncompressed (0 = no cap).")
+    parser.add_argument("--max_depth", type=int, default=DEFAULT_MAX_DEPTH, help="How many levels of nested .zip members to open (0 = none).")
+    parser.add_argument("--cache", default=CACHE_FILE, help="Per-member results cache reused across runs.")
+    parser.add_argument("--no_cache", action="store_true", help="Parse every member and do not read or write the cache.")
+    parser.add_argument("--cache_max_age_days", type=float, default=DEFAULT_CACHE_MAX_AGE_DAYS, help="Evict cache entries unused for this many days.")
+    parser.add_argument("--sources", default=SOURCES_FILE, help="CSV mapping each URL back to the files it was found in ('' to skip).")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    zpath = Path(args.zip)
     if not zpath.exists():
         print(f"ERROR: ZIP not found at {zpath.resolve()}")
         return
 
-    seen = set()
-    with zipfile.ZipFile(zpath, "r") as z:
-        for name in z.namelist():
-            # skip directories
-            if name.endswith("/") or name.endswith("\\"):
-                continue
-            try:
-                data = z.read(name)
-            except Exception:
-                continue
+    with collect_metrics(args, "extract_links_robust"):
+        with METRICS.timer("extract.total"):
+            run(args, zpath)
+
+def run(args, zpath: Path):
+    sources = defaultdict(set)
+    max_bytes = int(args.max_member_mb * 1024 * 1024)
+    cache_path = Path(args.cache)
+    settings = cache_settings(max_bytes, args.max_depth)
+    cache = None if args.no_cache else load_cache(cache_path, settings)
+    for name, found in iter_member_links(zpath, workers=args.workers, max_bytes=max_bytes,
+                                         max_depth=args.max_depth, cache=cache):
+        if VERBOSE and found:
+            print(f"[+] {name}: {len(found)} link(s)")
+        METRICS.count("extract.links_found", len(found))
+        for url in found:
+            canon = canonical_url(url)
+            if canon is not None:
+                sources[canon].add((name, url))
 
-            ext = Path(name).suffix.lower()
-            found = set()
-
-            if ext in {".html", ".htm"}:
-                text = try_decode(data)
-                found |= extract_from_html_bs(text)
-            elif ext in {".txt", ".md", ".csv"}:
-                text = try_decode(data)
-                found |= extract_from_html(text)
-            elif ext == ".docx":
-                found |= extract_from_docx_bytes(data)
-            elif ext in {".xlsx", ".xlsm"}:
-                found |= extract_from_xlsx_bytes(data)
-            elif ext == ".pdf":
-                found |= extract_from_pdf_bytes(data)
-            elif ext in {".json", ".ndjson", ".jsonl"}:
-                text = try_decode(data)
-                found |= extract_from_json_text(text)
-            elif ext in {".url"}:
-                # Windows InternetShortcut files are INI-like
-                text = try_decode(data)
-                found |= extract_from_html(text)
-            else:
-                # Fallback: try plain decode + regex
-                text = try_decode(data)
-                if text:
-                    found |= extract_from_html(text)
-
-            if VERBOSE and found:
-                print(f"[+] {name}: {len(found)} link(s)")
-
-            seen |= found
+    if cache is not None:
+        evicted = save_cache(cache_path, cache, settings, args.cache_max_age_days)
+        if VERBOSE and evicted:
+            print(f"[cache] evicted {evicted} stale entr{'y' if evicted == 1 else 'ies'}")
 
+    seen = set(sources)
     if not seen:
         print("No links found. Consider checking:")
         print(" - ZIP_FILE name is correct")
         print(" - Links are share links (chat.openai.com/share or chatgpt.com/share)")
         print(" - Files inside ZIP are supported types (txt, docx, xlsx, html, json, pdf)")
-    Path(OUT_FILE).write_text("\n".join(sorted(seen)), encoding="utf-8")
-    print(f"✅ Extracted {len(seen)} links into {OUT_FILE}")
+    Path(args.out).write_text("\n".join(sorted(seen)), encoding="utf-8")
+    METRICS.count("extract.links_unique", len(seen))
+    print(f"✅ Extracted {len(seen)} links into {args.out}")
+    if args.sources:
+        write_sources(Path(args.sources), sources)
+        spellings = sum(len({raw for _, raw in pairs}) for pairs in sources.values())
+        if spellings > len(seen):
+            print(f"[dedup] {spellings} link spellings collapsed to {len(seen)} share URLs; sources in {args.sources}")
 
 if __name__ == "__main__":
     main()
-
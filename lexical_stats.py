@@ -0,0 +1,276 @@
+import argparse
+import bisect
+import csv
+import json
+import os
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+import split_user_texts_fixed as sutf
+from transcript_store import TranscriptStore
+from metrics import METRICS, add_arguments as add_metrics_arguments, collect as collect_metrics
+
+# --------------------------
+# CONFIG DEFAULTS (Windows)
+# --------------------------
+DEFAULT_BASE = r"C:\Users\KAFLYNN\Desktop\chatgpt_transcripts"
+DEFAULT_TXT_DIR = "TXT_users"
+DEFAULT_RAW_DIR = "transcripts_raw"      # for turn counts
+DEFAULT_LINKS_CSV = "transcript_user_links.csv"
+DEFAULT_OUT_CSV = "transcript_lexical_stats.csv"
+DEFAULT_VOCAB_CSV = ""                   # e.g. "vocabulary.csv"
+DEFAULT_DTM = ""                         # e.g. "user_dtm.npz" (+ .json with rows/columns)
+# Words: letters with inner apostrophes ("don't"); digits and punctuation are not counted
+TOKEN_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(text.lower())
+
+# --------------------------
+# Dictionary (word list) handling
+# --------------------------
+def load_dictionary(path: Path):
+    """
+    Word list with one "category<TAB or comma>word" per line (# starts a
+    comment). A trailing * makes the word a prefix, as in LIWC dictionaries:
+    "posemo, happ*". Returns {category: [patterns]} in file order.
+    """
+    cats = {}
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for n, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = [p.strip() for p in re.split(r"[\t,]", line, maxsplit=1)]
+            if len(parts) != 2 or not parts[0] or not parts[1]:
+                print(f"[WARN] {path}:{n}: expected 'category, word'; skipped", file=sys.stderr)
+                continue
+            cats.setdefault(parts[0], []).append(parts[1].lower())
+    return cats
+
+def category_matrix(vocab, categories: dict):
+    """
+    Sparse (terms x categories) 0/1 matrix: term t belongs to category c if
+    it equals one of c's words or starts with one of its prefix* entries.
+    """
+    terms = sorted(vocab, key=vocab.get)
+    order = sorted(range(len(terms)), key=terms.__getitem__)
+    ordered = [terms[i] for i in order]
+    rows, cols = [], []
+    for c, patterns in enumerate(categories.values()):
+        hit = set()
+        for pat in patterns:
+            if pat.endswith("*"):
+                # All terms sharing the prefix sit in one run of the sorted vocabulary
+                prefix = pat[:-1]
+                lo = bisect.bisect_left(ordered, prefix)
+                hi = bisect.bisect_left(ordered, prefix + "\U0010ffff")
+                hit.update(order[lo:hi])
+            elif pat in vocab:
+                hit.add(vocab[pat])
+        rows.extend(hit)
+        cols.extend([c] * len(hit))
+    data = np.ones(len(rows), dtype=np.int32)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(vocab), len(categories)))
+
+# --------------------------
+# One streaming pass -> sparse document-term matrix
+# --------------------------
+class TermMatrixBuilder:
+    """Accumulates documents into CSR arrays; only per-document term counts are held."""
+
+    def __init__(self):
+        self.vocab = {}
+        self.names = []
+        self.indptr = [0]
+        self.indices = []
+        self.counts = []
+
+    def add(self, name: str, text: str):
+        counts = Counter(tokenize(text))
+        vocab = self.vocab
+        self.indices.extend(vocab.setdefault(t, len(vocab)) for t in counts)
+        self.counts.extend(counts.values())
+        self.indptr.append(len(self.indices))
+        self.names.append(name)
+
+    def matrix(self):
+        return sparse.csr_matrix(
+            (np.asarray(self.counts, dtype=np.int32), np.asarray(self.indices, dtype=np.int32),
+             np.asarray(self.indptr, dtype=np.int64)),
+            shape=(len(self.names), len(self.vocab)))
+
+def iter_user_files(txt_dir: Path, raw_dir: Path):
+    """(filename, user_text, raw_lines_or_None) for each TXT_users file, in name order."""
+    for p in sorted(txt_dir.glob("*_user.txt")):
+        raw = raw_dir / f"{p.name[:-len('_user.txt')]}.txt"
+        yield (p.name, p.read_text(encoding="utf-8", errors="ignore"),
+               sutf.read_lines(raw) if raw.is_file() else None)
+
+def iter_store_users(store: TranscriptStore):
+    raw = {i: text for i, _, text, _ in store.iter_raw()}
+    for i, name, text in store.iter_user():
+        yield name, text, sutf.text_lines(raw.get(i, ""))
+
+def build(items):
+    """Returns (builder, turns) with turns[i] = (user, agent) or None per document."""
+    builder = TermMatrixBuilder()
+    turns = []
+    for name, text, raw_lines in items:
+        builder.add(name, text)
+        turns.append(sutf.count_turns(raw_lines) if raw_lines is not None else None)
+    return builder, turns
+
+def document_stats(dtm, names, turns, categories: dict, cat_counts):
+    """One stats row (dict) per document."""
+    tokens = np.asarray(dtm.sum(axis=1)).ravel()
+    types = np.diff(dtm.indptr)
+    rows = []
+    for r, name in enumerate(names):
+        n = int(tokens[r])
+        row = {"filename": name, "word_count": n, "unique_words": int(types[r]),
+               "type_token_ratio": round(types[r] / n, 4) if n else "",
+               "user_turns": turns[r][0] if turns[r] is not None else "",
+               "assistant_turns": turns[r][1] if turns[r] is not None else ""}
+        for c, cat in enumerate(categories):
+            k = int(cat_counts[r, c])
+            row[f"{cat}_count"] = k
+            # LIWC reports categories as a percentage of all words
+            row[f"{cat}_pct"] = round(100.0 * k / n, 2) if n else ""
+        rows.append(row)
+    return rows
+
+def write_vocab(path: Path, dtm, vocab):
+    terms = sorted(vocab, key=vocab.get)
+    total = np.asarray(dtm.sum(axis=0)).ravel()
+    docs = np.bincount(dtm.indices, minlength=len(terms))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator=os.linesep)
+        w.writerow(["term", "count", "documents"])
+        for j in np.argsort(-total, kind="stable"):
+            w.writerow([terms[j], int(total[j]), int(docs[j])])
+
+def save_dtm(path: Path, dtm, names, vocab):
+    """The matrix as .npz, plus row filenames and column terms in a .json beside it."""
+    sparse.save_npz(path, dtm)
+    meta = {"rows": names, "columns": sorted(vocab, key=vocab.get)}
+    path.with_suffix(".json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+def join_links(links_csv: Path, stats_rows, out_csv: Path):
+    """
+    Append the stats columns to each link CSV row with the same filename;
+    files missing from the link CSV are added at the end with stats only.
+    Returns (rows written, rows joined).
+    """
+    by_name = {r["filename"]: r for r in stats_rows}
+    stat_fields = [k for k in stats_rows[0] if k != "filename"] if stats_rows else []
+    with open(links_csv, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        link_fields = list(reader.fieldnames or ["filename"])
+        links = list(reader)
+    used = set()
+    written = joined = 0
+    with open(out_csv, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=link_fields + stat_fields, lineterminator=os.linesep, restval="")
+        w.writeheader()
+        for row in links:
+            stats = by_name.get(row.get("filename", ""))
+            if stats is not None:
+                used.add(stats["filename"])
+                row.update({k: stats[k] for k in stat_fields})
+                joined += 1
+            w.writerow(row)
+            written += 1
+        for stats in stats_rows:
+            if stats["filename"] not in used:
+                w.writerow(stats)
+                written += 1
+    return written, joined
+
+def write_stats(out_csv: Path, stats_rows):
+    with open(out_csv, "w", encoding="utf-8", newline="") as f:
+        fields = list(stats_rows[0]) if stats_rows else ["filename"]
+        w = csv.DictWriter(f, fieldnames=fields, lineterminator=os.linesep)
+        w.writeheader()
+        w.writerows(stats_rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Word counts, vocabulary and dictionary-category counts for user-only transcripts, joined onto the link CSV.")
+    parser.add_argument("--base", default=DEFAULT_BASE, help="Base folder (default: your Desktop chatgpt_transcripts).")
+    parser.add_argument("--txt_dir", default=DEFAULT_TXT_DIR, help="Folder under base containing *_user.txt files.")
+    parser.add_argument("--raw_dir", default=DEFAULT_RAW_DIR, help="Folder under base with the raw transcripts (for turn counts).")
+    parser.add_argument("--links_csv", default=DEFAULT_LINKS_CSV, help="link_user_transcripts.py output under base to join onto ('' for stats only).")
+    parser.add_argument("--dictionary", default="", help="Word list: 'category, word' per line; word* matches a prefix.")
+    parser.add_argument("--out_csv", default=DEFAULT_OUT_CSV, help="Output CSV under base.")
+    parser.add_argument("--vocab_csv", default=DEFAULT_VOCAB_CSV, help="Also write corpus vocabulary (term, count, documents) here.")
+    parser.add_argument("--dtm", default=DEFAULT_DTM, help="Also save the sparse document-term matrix here (.npz).")
+    parser.add_argument("--store", default="", metavar="DB", help="Read user and raw text from a transcript_store.py database instead.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    base = Path(args.base)
+    txt_dir = base / args.txt_dir
+    if args.store:
+        if not Path(args.store).exists():
+            print(f"[ERROR] Store not found: {args.store}", file=sys.stderr)
+            sys.exit(1)
+    elif not txt_dir.exists():
+        print(f"[ERROR] Transcript folder not found: {txt_dir}", file=sys.stderr)
+        sys.exit(1)
+    categories = {}
+    if args.dictionary:
+        dict_path = Path(args.dictionary)
+        if not dict_path.exists():
+            print(f"[ERROR] Dictionary not found: {dict_path}", file=sys.stderr)
+            sys.exit(1)
+        categories = load_dictionary(dict_path)
+
+    with collect_metrics(args, "lexical_stats"):
+        with METRICS.timer("lexical.total"):
+            run(args, base, txt_dir, categories)
+
+def run(args, base: Path, txt_dir: Path, categories: dict):
+    with METRICS.timer("lexical.build"):
+        if args.store:
+            with TranscriptStore(args.store) as store:
+                builder, turns = build(iter_store_users(store))
+        else:
+            builder, turns = build(iter_user_files(txt_dir, base / args.raw_dir))
+        dtm = builder.matrix()
+    if not builder.names:
+        print(f"[WARN] No *_user.txt files found in: {txt_dir}")
+        return
+    METRICS.count("lexical.documents", len(builder.names))
+    METRICS.count("lexical.tokens", int(dtm.sum()))
+
+    with METRICS.timer("lexical.categories"):
+        cat_counts = (dtm @ category_matrix(builder.vocab, categories)).toarray() if categories else None
+    stats_rows = document_stats(dtm, builder.names, turns, categories, cat_counts)
+
+    out_csv = base / args.out_csv
+    links_csv = base / args.links_csv if args.links_csv else None
+    if links_csv is not None and links_csv.exists():
+        written, joined = join_links(links_csv, stats_rows, out_csv)
+        print(f"[DONE] Joined stats for {joined} of {len(stats_rows)} file(s) onto {links_csv.name}; wrote {written} row(s) to: {out_csv}")
+    else:
+        if links_csv is not None:
+            print(f"[WARN] Link CSV not found, writing stats only: {links_csv}", file=sys.stderr)
+        write_stats(out_csv, stats_rows)
+        print(f"[DONE] Wrote stats for {len(stats_rows)} file(s) to: {out_csv}")
+
+    print(f"{len(builder.names)} document(s), {int(dtm.sum())} word(s), {len(builder.vocab)} distinct"
+          + (f", {len(categories)} dictionary categor{'y' if len(categories) == 1 else 'ies'}" if categories else ""))
+    if args.vocab_csv:
+        write_vocab(base / args.vocab_csv, dtm, builder.vocab)
+        print(f"[DONE] Vocabulary written to: {base / args.vocab_csv}")
+    if args.dtm:
+        save_dtm(base / args.dtm, dtm, builder.names, builder.vocab)
+        print(f"[DONE] Document-term matrix written to: {base / args.dtm}")
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,18 @@ from pathlib import Path
 import re
 import sys
 import argparse
+import csv
+import hashlib
+import math
+import os
+import pickle
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+from collections import Counter, defaultdict, deque
 from difflib import get_close_matches
+from transcript_store import TranscriptStore
+from metrics import METRICS, timed, add_arguments as add_metrics_arguments, collect as collect_metrics
 
 # --------------------------
 # CONFIG DEFAULTS (Windows)
@@ -13,6 +23,14 @@ DEFAULT_TXT_DIR = "TXT_users"
 DEFAULT_MASTER_XLSX = "Master10212025matching.xlsx"  # adjust if needed
 DEFAULT_OUT_CSV = "transcript_user_links.csv"
 DEFAULT_RENAMED_DIR = "TXT_users_named"
+NAME_CUTOFF = 0.86           # difflib similarity needed for a fuzzy name match
+NAME_SHORTLIST = 25          # roster names scored exactly per fuzzy query
+DEFAULT_SCAN_LINES = 400     # lines of each transcript searched for email/name (0 = all)
+ROSTER_CACHE_SUFFIX = ".roster.pkl"   # binary snapshot written next to the master workbook
+ROSTER_CACHE_VERSION = 1
+DEFAULT_WORKERS = 1
+CSV_FIELDS = ["filename", "filepath", "extracted_email", "extracted_name", "match_method",
+              "matched_name", "matched_email", "matched_student_id"]
 
 # --------------------------
 # Regex helpers
@@ -24,14 +42,20 @@ NAME_HINTS = [
     re.compile(r"^\s*my\s+name\s+is\s+(.+)$", re.IGNORECASE),
     re.compile(r"^\s*i\s*am\s+(.+)$", re.IGNORECASE),
 ]
+# The three hints start with different words, so one alternation is equivalent
+NAME_HINT_ANY = re.compile(r"^\s*(?:name\s*:?\s*(.+)|my\s+name\s+is\s+(.+)|i\s*am\s+(.+))$", re.IGNORECASE)
+EMAIL_LABEL_RE = re.compile(r"(?:email|mail)\s*:?", re.IGNORECASE)
+WS_RE = re.compile(r"\s+")
+NAME_TOKEN_RE = re.compile(r"^[A-Za-z][A-Za-z\.'\-]*$")
+NEAR_EMAIL_LINES = 3         # lines above the first email searched for a name
 
 # A loose "looks like a person name" filter (Firstname Lastname, 2–4 words, mostly letters/-.')
 def looks_like_name(text: str) -> bool:
-    tokens = re.split(r"\s+", text.strip())
+    tokens = WS_RE.split(text.strip())
     if not (2 <= len(tokens) <= 4):
         return False
     for t in tokens:
-        if not re.match(r"^[A-Za-z][A-Za-z\.'\-]*$", t):
+        if not NAME_TOKEN_RE.match(t):
             return False
     # Avoid sentences
     if any(p in text for p in [".", "!", "?","@"]):
@@ -53,48 +77,249 @@ def username_part(e: str) -> str:
 # --------------------------
 # Extraction from transcript
 # --------------------------
-def extract_email_and_name(text: str):
-    # emails
-    emails = EMAIL_RE.findall(text)
-    emails = list(dict.fromkeys(emails))  # de-dup preserve order
+def iter_lines(text: str):
+    """Lazily yield the same lines as text.splitlines()."""
+    start = 0
+    while True:
+        nl = text.find("\n", start)
+        if nl < 0:
+            # last piece: no line break after it
+            yield from text[start:].splitlines()
+            return
+        # keep the "\n" so "a\x0b\n" still yields its trailing empty line
+        yield from text[start:nl + 1].splitlines()
+        start = nl + 1
 
-    # try name hints line-by-line
+def extract_email_and_name(text, max_lines: int = DEFAULT_SCAN_LINES, early_exit: bool = False):
+    """
+    One pass over the first `max_lines` lines (0 = all) of `text`, a string or
+    any iterable of lines. Returns (emails, name) as the full-text scan would
+    for that window: emails in first-seen order, the first name hint that looks
+    like a name, else a likely name just above the first email.
+    With early_exit, stops as soon as an email and a hinted name are both found;
+    emails further down are then missed, so the match can differ.
+    """
+    lines = iter_lines(text) if isinstance(text, str) else text
+    emails = {}                     # dict as an ordered set
     name = None
-    for line in text.splitlines():
-        ln = line.strip()
-        for pat in NAME_HINTS:
-            m = pat.match(ln)
-            if m:
-                candidate = m.group(1).strip(" :-\t")
-                # Stop at first delimiter like "email:" inside name lines
-                candidate = re.split(r"(?:email|mail)\s*:?", candidate, flags=re.I)[0].strip()
-                if looks_like_name(candidate):
-                    name = clean_name(candidate)
-                    break
-        if name:
+    near_email_name = None
+    recent = deque(maxlen=NEAR_EMAIL_LINES)
+
+    for n, line in enumerate(lines):
+        if max_lines and n >= max_lines:
             break
 
-    # If still no name, guess using a line near the first email
-    if not name and emails:
-        first_email = emails[0]
-        lines = text.splitlines()
-        for i, line in enumerate(lines):
-            if first_email in line:
-                # look a couple of lines above for a likely name
-                window = lines[max(0, i-3):i]
-                for cand in reversed(window):
+        found = EMAIL_RE.findall(line)
+        if found:
+            if not emails:
+                # look a couple of lines above the first email for a likely name
+                for cand in reversed(recent):
                     cand = cand.strip(" :-\t")
                     if looks_like_name(cand):
-                        name = clean_name(cand)
+                        near_email_name = clean_name(cand)
                         break
-                break
+            for e in found:
+                emails.setdefault(e, None)
+
+        if name is None:
+            m = NAME_HINT_ANY.match(line.strip())
+            if m:
+                candidate = (m.group(1) or m.group(2) or m.group(3)).strip(" :-\t")
+                # Stop at first delimiter like "email:" inside name lines
+                candidate = EMAIL_LABEL_RE.split(candidate, 1)[0].strip()
+                if looks_like_name(candidate):
+                    name = clean_name(candidate)
+
+        if early_exit and name and emails:
+            break
+        recent.append(line)
 
-    return emails, name
+    return list(emails), name or near_email_name
 
 # --------------------------
 # Matching to master
 # --------------------------
-def load_master(master_path: Path):
+class NameIndex:
+    """
+    Character-trigram index over roster names. A query only gets full difflib
+    scoring against the few names sharing the most trigrams with it, instead of
+    a SequenceMatcher pass over the whole roster.
+    """
+
+    def __init__(self, names=(), shortlist: int = NAME_SHORTLIST):
+        self.shortlist = shortlist
+        self.first_pos = {}
+        for pos, name in enumerate(names):
+            self.first_pos.setdefault(name, pos)
+        self.names = list(self.first_pos)
+        self.postings = defaultdict(list)
+        for i, name in enumerate(self.names):
+            for g in set(self.grams(name)):
+                self.postings[g].append(i)
+
+    @staticmethod
+    def grams(s: str):
+        s = f" {s} "
+        return [s[i:i + 3] for i in range(len(s) - 2)]
+
+    def candidates(self, query: str):
+        counts = Counter()
+        for g in set(self.grams(query)):
+            counts.update(self.postings.get(g, ()))
+        return [self.names[i] for i, _ in counts.most_common(self.shortlist)]
+
+    def match(self, query: str, cutoff: float = NAME_CUTOFF):
+        """Row position of the best name scoring >= cutoff (same ranking as get_close_matches), or None."""
+        hits = get_close_matches(query, self.candidates(query), n=1, cutoff=cutoff)
+        return self.first_pos[hits[0]] if hits else None
+
+    def match_many(self, queries, cutoff: float = NAME_CUTOFF):
+        """match() for many names at once; repeated queries are scored only once."""
+        memo = {}
+        out = []
+        for q in queries:
+            if not q:
+                out.append(None)
+                continue
+            q = q.strip().lower()
+            if q not in memo:
+                memo[q] = self.match(q, cutoff)
+            out.append(memo[q])
+        return out
+
+    def to_state(self) -> dict:
+        return {"shortlist": self.shortlist, "first_pos": self.first_pos, "names": self.names,
+                "postings": dict(self.postings)}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        idx = cls(shortlist=state["shortlist"])
+        idx.first_pos, idx.names = state["first_pos"], state["names"]
+        idx.postings = defaultdict(list, state["postings"])
+        return idx
+
+class RosterIndex:
+    """
+    Hash lookups over the normalized roster, built once. Each key maps to the
+    position of its FIRST row, so results match the old `.loc[...].head(1)` scans.
+    """
+
+    def __init__(self, df: pd.DataFrame = None):
+        if df is None:
+            return
+        self.df = df
+        self.by_email = self._first_positions(df["_email_norm"])
+        self.by_user = self._first_positions(df["_user_norm"])
+        self.by_id = self._first_positions(df["_id"].astype(str).str.strip().str.lower())
+        self.names = NameIndex(df["_name_norm"].tolist()) if "_name_norm" in df else NameIndex([])
+
+    @staticmethod
+    def _first_positions(values) -> dict:
+        index = {}
+        for pos, key in enumerate(values.tolist()):
+            if key not in index:
+                index[key] = pos
+        return index
+
+    def row(self, pos: int):
+        return self.df.iloc[pos]
+
+    def lookup(self, table: dict, key):
+        pos = table.get(key)
+        return None if pos is None else self.row(pos)
+
+    def by_email_row(self, e_norm: str):
+        return self.lookup(self.by_email, e_norm)
+
+    def by_user_row(self, u: str):
+        return self.lookup(self.by_user, u)
+
+    def by_id_row(self, sid):
+        return self.lookup(self.by_id, str(sid).strip().lower())
+
+    # Plain-container state, so a snapshot loads no matter which module name
+    # (script or import) this class lives under
+    def to_state(self) -> dict:
+        return {"df": self.df, "by_email": self.by_email, "by_user": self.by_user,
+                "by_id": self.by_id, "names": self.names.to_state()}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        roster = cls()
+        roster.df, roster.by_email = state["df"], state["by_email"]
+        roster.by_user, roster.by_id = state["by_user"], state["by_id"]
+        roster.names = NameIndex.from_state(state["names"])
+        return roster
+
+def as_roster(master) -> RosterIndex:
+    # Accept a bare DataFrame too (e.g. one built outside load_master)
+    return master if isinstance(master, RosterIndex) else RosterIndex(master)
+
+# --------------------------
+# Roster snapshot: skip read_excel when the workbook has not changed
+# --------------------------
+def roster_cache_path(master_path: Path) -> Path:
+    return master_path.with_name(master_path.name + ROSTER_CACHE_SUFFIX)
+
+def workbook_hash(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_roster_snapshot(master_path: Path):
+    """(roster, name_col, email_col, id_col) from the sidecar, or None if missing or stale."""
+    cache_path = roster_cache_path(master_path)
+    if not cache_path.exists():
+        return None
+    try:
+        with open(cache_path, "rb") as f:
+            snap = pickle.load(f)
+        if snap.get("version") != ROSTER_CACHE_VERSION:
+            return None
+        st = master_path.stat()
+        key = snap["key"]
+        if key["size"] != st.st_size:
+            return None
+        if key["mtime_ns"] != st.st_mtime_ns:
+            # Same size but touched/copied: only the content hash can say it is unchanged
+            if key["hash"] != workbook_hash(master_path):
+                return None
+            # Unchanged: record the new mtime so later runs skip the hash again
+            key["mtime_ns"] = st.st_mtime_ns
+            write_snapshot(cache_path, snap)
+        return RosterIndex.from_state(snap["roster"]), snap["name_col"], snap["email_col"], snap["id_col"]
+    except Exception as e:
+        print(f"[WARN] Ignoring roster cache {cache_path}: {e}", file=sys.stderr)
+        return None
+
+def save_roster_snapshot(master_path: Path, roster, name_col, email_col, id_col):
+    cache_path = roster_cache_path(master_path)
+    st = master_path.stat()
+    snap = {
+        "version": ROSTER_CACHE_VERSION,
+        "key": {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": workbook_hash(master_path)},
+        "name_col": name_col, "email_col": email_col, "id_col": id_col,
+        "roster": roster.to_state(),
+    }
+    write_snapshot(cache_path, snap)
+
+def write_snapshot(cache_path: Path, snap: dict):
+    tmp = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(snap, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    except Exception as e:
+        print(f"[WARN] Could not write roster cache {cache_path}: {e}", file=sys.stderr)
+
+def load_master(master_path: Path, use_cache: bool = True):
+    if use_cache:
+        cached = load_roster_snapshot(master_path)
+        if cached is not None:
+            return cached
+
     # Try to be flexible on column names
     df = pd.read_excel(master_path, engine="openpyxl")
     cols = {c.lower(): c for c in df.columns}
@@ -113,45 +338,155 @@ def load_master(master_path: Path):
     df["_user_norm"]  = df["_email_norm"].str.split("@").str[0]
     df["_id"]         = df[id_col] if id_col else ""
 
-    return df, name_col, email_col, id_col
+    roster = RosterIndex(df)
+    if use_cache:
+        save_roster_snapshot(master_path, roster, name_col, email_col, id_col)
+    return roster, name_col, email_col, id_col
 
-def fuzzy_match_name(candidate_name: str, master_df: pd.DataFrame, cutoff=0.85):
+def fuzzy_match_name(candidate_name: str, master, cutoff=0.85):
     if not candidate_name:
         return None
-    master_names = master_df["_name_norm"].tolist()
-    cand = candidate_name.strip().lower()
-    hits = get_close_matches(cand, master_names, n=1, cutoff=cutoff)
-    if hits:
-        match = hits[0]
-        row = master_df.loc[master_df["_name_norm"] == match].head(1)
-        if not row.empty:
-            return row.iloc[0]
-    return None
-
-def match_record(emails, name, master_df: pd.DataFrame):
+    roster = as_roster(master)
+    pos = roster.names.match(candidate_name.strip().lower(), cutoff=cutoff)
+    return None if pos is None else roster.row(pos)
+
+def fuzzy_match_names(candidate_names, master, cutoff=NAME_CUTOFF):
+    """Batch fuzzy match: roster row positions (or None) aligned with `candidate_names`."""
+    return as_roster(master).names.match_many(candidate_names, cutoff=cutoff)
+
+def match_record(emails, name, master):
+    roster = as_roster(master)
+
     # 1) exact email match
     for e in emails:
-        e_norm = normalize_email(e)
-        row = master_df.loc[master_df["_email_norm"] == e_norm].head(1)
-        if not row.empty:
-            return "email_exact", row.iloc[0]
+        row = roster.by_email_row(normalize_email(e))
+        if row is not None:
+            return "email_exact", row
 
     # 2) username (before @) match
     for e in emails:
         u = username_part(e)
         if not u:
             continue
-        row = master_df.loc[master_df["_user_norm"] == u].head(1)
-        if not row.empty:
-            return "email_username", row.iloc[0]
+        row = roster.by_user_row(u)
+        if row is not None:
+            return "email_username", row
 
     # 3) fuzzy name match
-    row = fuzzy_match_name(name, master_df, cutoff=0.86) if name else None
+    row = None
+    if name:
+        with METRICS.timer("link.fuzzy"):
+            row = fuzzy_match_name(name, roster, cutoff=NAME_CUTOFF)
     if row is not None:
         return "name_fuzzy", row
 
     return None, None
 
+# --------------------------
+# Per-file linking (runs in worker processes with --workers)
+# --------------------------
+def iter_file_lines(p: Path):
+    """Lines of a transcript as text.splitlines() would give them after newline normalization."""
+    with open(p, "r", encoding="utf-8", errors="ignore", newline=None) as f:
+        for line in f:
+            yield from iter_lines(line)
+
+def renamed_stem(matched, name_col, fallback: str) -> str:
+    # Build a safe filename stem: ID_FirstLast if ID exists, else FirstLast
+    firstlast = clean_name(str(matched[name_col])) if name_col else ""
+    sid = str(matched["_id"]) if matched["_id"] != "" else ""
+    if sid and sid.lower() != "nan":
+        new_stem = f"{sid}_{firstlast}".strip("_")
+    else:
+        new_stem = firstlast or fallback
+    return re.sub(r"[^A-Za-z0-9_\- ]", "", new_stem).strip().replace(" ", "")
+
+def link_file(p: Path, roster, name_col, email_col, scan_lines=DEFAULT_SCAN_LINES, early_exit=False):
+    """
+    Read, extract and match one transcript.
+    Returns (csv_row, renamed_stem_or_None), or (None, warning) if unreadable.
+    """
+    try:
+        # Streams only as far as the scan window / early exit needs
+        emails, guessed_name = extract_email_and_name(iter_file_lines(p), max_lines=scan_lines, early_exit=early_exit)
+    except Exception as e:
+        return None, f"Could not read {p}: {e}"
+    return link_extracted(p.name, str(p), emails, guessed_name, roster, name_col, email_col)
+
+def link_text(name: str, filepath: str, text: str, roster, name_col, email_col, scan_lines=DEFAULT_SCAN_LINES, early_exit=False):
+    """link_file for user text held in memory (e.g. read from a --store)."""
+    emails, guessed_name = extract_email_and_name(text, max_lines=scan_lines, early_exit=early_exit)
+    return link_extracted(name, filepath, emails, guessed_name, roster, name_col, email_col)
+
+def link_extracted(name: str, filepath: str, emails, guessed_name, roster, name_col, email_col):
+    method, matched = match_record(emails, guessed_name, roster)
+
+    mapped = {
+        "filename": name,
+        "filepath": filepath,
+        "extracted_email": ";".join(emails) if emails else "",
+        "extracted_name": guessed_name or "",
+        "match_method": method or "",
+        "matched_name": (matched[name_col] if (matched is not None and name_col) else ""),
+        "matched_email": (matched[email_col] if (matched is not None and email_col) else ""),
+        "matched_student_id": (matched["_id"] if (matched is not None and "_id" in matched) else ""),
+    }
+    stem = renamed_stem(matched, name_col, Path(name).stem) if matched is not None else None
+    return mapped, stem
+
+def link_source(src, roster, name_col, email_col, scan_lines=DEFAULT_SCAN_LINES, early_exit=False):
+    """link_file for a Path, or link_text for a (filename, filepath, text) triple."""
+    if isinstance(src, tuple):
+        return link_text(*src, roster, name_col, email_col, scan_lines, early_exit)
+    return link_file(src, roster, name_col, email_col, scan_lines, early_exit)
+
+_worker = {}
+
+def _init_link_worker(roster, name_col, email_col, scan_lines: int, early_exit: bool):
+    _worker.update(roster=roster, name_col=name_col, email_col=email_col,
+                   scan_lines=scan_lines, early_exit=early_exit)
+
+def _link_in_worker(src):
+    w = _worker
+    return timed(link_source, src, w["roster"], w["name_col"], w["email_col"], w["scan_lines"], w["early_exit"])
+
+# --------------------------
+# Output helpers
+# --------------------------
+def csv_value(v):
+    # Match DataFrame.to_csv: missing values become empty cells
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return ""
+    return v
+
+def unique_name(stem: str, used: dict) -> str:
+    """
+    {stem}_user.txt, or {stem}_2_user.txt, _3... when an earlier file in this
+    run already took it. Files are visited in sorted order, so suffixes are stable.
+    """
+    name = f"{stem}_user.txt"
+    k = used.get(name, 0)
+    used[name] = k + 1
+    while k:
+        k += 1
+        name = f"{stem}_{k}_user.txt"
+        if name not in used:
+            used[name] = 1
+            break
+    return name
+
+def place_copy(src: Path, target: Path, copy_mode: str = "hardlink"):
+    """Hardlink src to target when possible, else a plain copy (sendfile/fcopyfile where the OS has it)."""
+    if target.exists() or target.is_symlink():
+        target.unlink()
+    if copy_mode == "hardlink":
+        try:
+            os.link(src, target)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(src, target)
+
 # --------------------------
 # Main
 # --------------------------
@@ -163,73 +498,120 @@ def main():
     parser.add_argument("--out_csv", default=DEFAULT_OUT_CSV, help="Output mapping CSV filename under base.")
     parser.add_argument("--rename", action="store_true", help="Also rename files into a new folder using matched IDs/names.")
     parser.add_argument("--renamed_dir", default=DEFAULT_RENAMED_DIR, help="Folder for renamed files (under base).")
+    parser.add_argument("--no_roster_cache", action="store_true", help="Always re-read the master workbook instead of its cached snapshot.")
+    parser.add_argument("--scan_lines", type=int, default=DEFAULT_SCAN_LINES, help="Lines of each transcript searched for email/name (0 = whole file).")
+    parser.add_argument("--early_exit", action="store_true",
+                        help="Stop reading a transcript once an email and a name are found (faster; may miss a later, matching email).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Processes reading and matching files in parallel (default: 1).")
+    parser.add_argument("--copy_mode", choices=("hardlink", "copy"), default="hardlink",
+                        help="How --rename places files: hardlink (falls back to copy) or copy.")
+    parser.add_argument("--store", default="", metavar="DB",
+                        help="Link the user texts held in this store (see transcript_store.py) and save the results there; "
+                             "--rename then records names for the exporter instead of copying files.")
+    add_metrics_arguments(parser)
     args = parser.parse_args()
 
+    with collect_metrics(args, "link_user_transcripts"):
+        with METRICS.timer("link.total"):
+            run(args)
+
+def run(args):
     base = Path(args.base)
     txt_dir = base / args.txt_dir
     master_path = base / args.master
     out_csv = base / args.out_csv
     renamed_dir = base / args.renamed_dir
 
-    if not txt_dir.exists():
+    store = None
+    if args.store:
+        if not Path(args.store).exists():
+            print(f"[ERROR] Store not found: {args.store}", file=sys.stderr)
+            sys.exit(1)
+    elif not txt_dir.exists():
         print(f"[ERROR] Transcript folder not found: {txt_dir}", file=sys.stderr)
         sys.exit(1)
     if not master_path.exists():
         print(f"[ERROR] Master Excel not found: {master_path}", file=sys.stderr)
         sys.exit(1)
 
-    master_df, name_col, email_col, id_col = load_master(master_path)
+    use_cache = not args.no_roster_cache
+    if args.store:
+        store = TranscriptStore(args.store)
+        # filepath is where the exporter would put the file, so the CSV matches a folder run
+        stored = list(store.iter_user())
+        keys = [i for i, _, _ in stored]
+        files = [(name, str(txt_dir / name), text) for _, name, text in stored]
+    else:
+        files = sorted(txt_dir.glob("*.txt"))
+        keys = [None] * len(files)
 
-    rows = []
-    files = sorted(txt_dir.glob("*.txt"))
-    for p in files:
-        try:
-            text = p.read_text(encoding="utf-8", errors="ignore")
-            # normalize newlines
-            text = text.replace("\r\n","\n").replace("\r","\n")
-        except Exception as e:
-            print(f"[WARN] Could not read {p}: {e}", file=sys.stderr)
-            continue
+    # Built once here; pool workers receive the pickled index instead of re-reading the workbook
+    with METRICS.timer("link.load_master"):
+        roster, name_col, email_col, _ = load_master(master_path, use_cache=use_cache)
+    if args.workers > 1 and len(files) > 1:
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_link_worker,
+                                   initargs=(roster, name_col, email_col, args.scan_lines, args.early_exit))
+        chunksize = max(1, min(64, len(files) // (args.workers * 4) or 1))
+        results = pool.map(_link_in_worker, files, chunksize=chunksize)
+    else:
+        pool = None
+        results = (timed(link_source, p, roster, name_col, email_col, args.scan_lines, args.early_exit) for p in files)
+
+    fields = CSV_FIELDS + (["renamed_file"] if args.rename else [])
+    used_names = {}
+    collisions = 0
+    n_rows = 0
+    try:
+        # Rows are streamed to the CSV as they arrive (in sorted file order)
+        with open(out_csv, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, lineterminator=os.linesep)
+            writer.writeheader()
+            for key, p, ((mapped, extra), secs) in zip(keys, files, results):
+                fname = p[0] if store is not None else p.name
+                METRICS.add_time("link.file", secs, key=fname)
+                if mapped is None:
+                    print(f"[WARN] {extra}", file=sys.stderr)
+                    METRICS.count("link.failed")
+                    continue
+                METRICS.count(f"link.match.{mapped['match_method'] or 'none'}")
+
+                # Optional rename/copy into named folder
+                if args.rename:
+                    mapped["renamed_file"] = ""
+                    if extra is not None:
+                        new_name = unique_name(extra, used_names)
+                        if new_name != f"{extra}_user.txt":
+                            collisions += 1
+                            print(f"[WARN] {fname} maps to an existing name; saved as {new_name}", file=sys.stderr)
+                        target = renamed_dir / new_name
+                        if store is not None:
+                            # transcript_store.py writes the named copy on export
+                            mapped["renamed_file"] = new_name
+                        else:
+                            renamed_dir.mkdir(parents=True, exist_ok=True)
+                            try:
+                                # link/copy (not move) so original remains
+                                place_copy(p, target, args.copy_mode)
+                                mapped["renamed_file"] = new_name
+                            except Exception as e:
+                                print(f"[WARN] Could not write {target}: {e}", file=sys.stderr)
+
+                out_row = {k: csv_value(v) for k, v in mapped.items()}
+                if store is not None:
+                    store.put_link(key, out_row)
+                writer.writerow(out_row)
+                n_rows += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if store is not None:
+            store.close()
 
-        emails, guessed_name = extract_email_and_name(text)
-        method, matched = match_record(emails, guessed_name, master_df)
-
-        mapped = {
-            "filename": p.name,
-            "filepath": str(p),
-            "extracted_email": ";".join(emails) if emails else "",
-            "extracted_name": guessed_name or "",
-            "match_method": method or "",
-            "matched_name": (matched[name_col] if (matched is not None and name_col) else ""),
-            "matched_email": (matched[email_col] if (matched is not None and email_col) else ""),
-            "matched_student_id": (matched["_id"] if (matched is not None and "_id" in matched) else ""),
-        }
-        rows.append(mapped)
-
-        # Optional rename/copy into named folder
-        if args.rename and matched is not None:
-            renamed_dir.mkdir(parents=True, exist_ok=True)
-            # Build a safe filename: ID_FirstLast_user.txt if ID exists, else FirstLast_user.txt
-            firstlast = clean_name(str(matched[name_col])) if name_col else ""
-            sid = str(matched["_id"]) if matched["_id"] != "" else ""
-            if sid and sid.lower() != "nan":
-                new_stem = f"{sid}_{firstlast}".strip("_")
-            else:
-                new_stem = firstlast or p.stem
-            safe = re.sub(r"[^A-Za-z0-9_\- ]", "", new_stem).strip().replace(" ", "")
-            new_name = f"{safe}_user.txt"
-            target = renamed_dir / new_name
-            try:
-                # write (not move) so original remains
-                target.write_text(text, encoding="utf-8", errors="ignore")
-            except Exception as e:
-                print(f"[WARN] Could not write {target}: {e}", file=sys.stderr)
-
-    out_df = pd.DataFrame(rows)
-    out_df.to_csv(out_csv, index=False, encoding="utf-8")
-    print(f"[DONE] Wrote mapping for {len(rows)} file(s) to: {out_csv}")
+    print(f"[DONE] Wrote mapping for {n_rows} file(s) to: {out_csv}")
     if args.rename:
-        print(f"[DONE] Renamed copies written to: {renamed_dir}")
+        extra_note = f" ({collisions} name collision(s) given numeric suffixes)" if collisions else ""
+        where = f"recorded in {args.store} (export with transcript_store.py)" if store is not None else f"written to: {renamed_dir}"
+        print(f"[DONE] Renamed copies {where}{extra_note}")
 
 if __name__ == "__main__":
     main()
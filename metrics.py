@@ -0,0 +1,149 @@
+import cProfile
+import heapq
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# --------------------------
+# Shared run instrumentation: stage timers, counters, slowest items, cProfile
+# --------------------------
+DEFAULT_SLOWEST_N = 10
+
+class Metrics:
+    """
+    Collects timings and counters for one run. Disabled instances (the default
+    shared METRICS until a script enables it) make every call a cheap no-op.
+    Safe to update from several threads. Worker processes record into their
+    own copy, which the parent never sees, so pool workers should hand
+    timings back to the parent (see timed()).
+    """
+
+    def __init__(self, run: str = "", slowest_n: int = DEFAULT_SLOWEST_N, enabled: bool = True):
+        self.enabled = enabled
+        self.reset(run, slowest_n)
+
+    def reset(self, run: str = "", slowest_n: int = DEFAULT_SLOWEST_N):
+        self.run = run
+        self.slowest_n = slowest_n
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.stages = {}      # stage -> [seconds, calls]
+        self.counters = {}
+        self.slowest = {}     # stage -> min-heap of (seconds, key)
+        self._lock = threading.Lock()
+        self._profiler = None
+
+    def count(self, name: str, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, stage: str, seconds: float, key=None):
+        """Record one timed call of `stage`; `key` (e.g. a filename) enters the slowest-N list."""
+        if not self.enabled:
+            return
+        with self._lock:
+            s = self.stages.setdefault(stage, [0.0, 0])
+            s[0] += seconds
+            s[1] += 1
+            if key is not None and self.slowest_n:
+                heap = self.slowest.setdefault(stage, [])
+                item = (seconds, str(key))
+                if len(heap) < self.slowest_n:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+    def timer(self, stage: str, key=None):
+        return self._timer(stage, key) if self.enabled else nullcontext()
+
+    @contextmanager
+    def _timer(self, stage, key):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - t0, key)
+
+    def start_profile(self):
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def stop_profile(self, path):
+        if self._profiler is None:
+            return
+        self._profiler.disable()
+        self._profiler.dump_stats(str(path))
+        self._profiler = None
+
+    def report(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {"seconds": round(sec, 6), "calls": calls,
+                       "mean_ms": round(1000 * sec / calls, 3) if calls else None}
+                for name, (sec, calls) in sorted(self.stages.items())
+            }
+            slowest = {
+                name: [{"key": k, "seconds": round(sec, 6)} for sec, k in sorted(heap, reverse=True)]
+                for name, heap in sorted(self.slowest.items())
+            }
+            counters = dict(sorted(self.counters.items()))
+        return {
+            "run": self.run,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_seconds": round(time.perf_counter() - self._t0, 6),
+            "stages": stages,
+            "counters": counters,
+            "slowest": slowest,
+        }
+
+    def write(self, path):
+        Path(path).write_text(json.dumps(self.report(), indent=2, default=str), encoding="utf-8")
+
+# The instance every script records into; off unless --metrics/--profile is given
+METRICS = Metrics(enabled=False)
+
+def timed(fn, *args):
+    """
+    (fn(*args), seconds). For work done in a pool worker: return both and
+    let the parent add_time() them, since the worker's METRICS is its own.
+    """
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+def add_arguments(parser):
+    parser.add_argument("--metrics", default="", metavar="JSON", help="Write a JSON timing/counter report here at the end of the run.")
+    parser.add_argument("--profile", default="", metavar="PROF", help="Also run under cProfile and dump stats here (view with python -m pstats).")
+    parser.add_argument("--slowest", type=int, default=DEFAULT_SLOWEST_N, help="How many slowest items to keep per stage in the report.")
+
+@contextmanager
+def collect(args, run: str):
+    """
+    Enable METRICS for the body when --metrics or --profile was given, and
+    write the report / profile afterwards, even if the run fails part way.
+    """
+    metrics_path = getattr(args, "metrics", "")
+    profile_path = getattr(args, "profile", "")
+    if not (metrics_path or profile_path):
+        yield METRICS
+        return
+
+    METRICS.enabled = True
+    METRICS.reset(run, getattr(args, "slowest", DEFAULT_SLOWEST_N))
+    if profile_path:
+        METRICS.start_profile()
+    try:
+        yield METRICS
+    finally:
+        if profile_path:
+            METRICS.stop_profile(profile_path)
+            print(f"[DONE] cProfile stats written to: {profile_path}", file=sys.stderr)
+        if metrics_path:
+            METRICS.write(metrics_path)
+            print(f"[DONE] Metrics written to: {metrics_path}", file=sys.stderr)
+        METRICS.enabled = False
@@ -0,0 +1,241 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+import extract_links_robust as elr
+import link_user_transcripts as lut
+import scrape_transcripts as st
+import split_user_texts_fixed as sutf
+from metrics import METRICS, add_arguments as add_metrics_arguments, collect as collect_metrics
+
+# --------------------------
+# CONFIG DEFAULTS
+# --------------------------
+DEFAULT_ZIP = elr.ZIP_FILE
+DEFAULT_MASTER = lut.DEFAULT_MASTER_XLSX
+DEFAULT_OUT_CSV = lut.DEFAULT_OUT_CSV
+DEFAULT_QUEUE_SIZE = 64      # records buffered between two stages
+DEFAULT_DEDUPE_THRESHOLD = 0.85   # same default as dedupe_transcripts.py
+
+# --------------------------
+# Plumbing: run a generator stage in its own thread behind a bounded queue
+# --------------------------
+_END = object()
+
+def threaded(gen, maxsize: int = DEFAULT_QUEUE_SIZE):
+    """
+    Drain `gen` in a background thread and return an iterator over its items.
+    The bounded queue lets this stage run ahead of its consumer by at most
+    `maxsize` records; an exception in the stage is re-raised to the consumer.
+    """
+    q = queue.Queue(maxsize=maxsize)
+    errors = []
+
+    def run():
+        try:
+            for item in gen:
+                q.put(item)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            q.put(_END)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    def drain():
+        while True:
+            item = q.get()
+            if item is _END:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+
+    return drain()
+
+# --------------------------
+# Stages
+# --------------------------
+def links_stage(zpath: Path, workers: int, cache_path, stats: dict, urls_out: Path = None, sources_out: Path = None):
+    """Yield (index, canonical_url) for each new share link, in the order members are scanned."""
+    cache = None
+    settings = elr.cache_settings(elr.DEFAULT_MAX_MEMBER_MB << 20, elr.DEFAULT_MAX_DEPTH)
+    if cache_path:
+        cache = elr.load_cache(Path(cache_path), settings)
+    sources = defaultdict(set)
+    for name, found in elr.iter_member_links(zpath, workers=workers, cache=cache):
+        for raw in sorted(found):
+            url = elr.canonical_url(raw)
+            if url is None:
+                continue
+            new = url not in sources
+            sources[url].add((name, raw))
+            if new:
+                stats["links"] += 1
+                yield stats["links"], url
+    if cache is not None:
+        elr.save_cache(Path(cache_path), cache, settings)
+    if urls_out is not None:
+        # In discovery order (dicts keep it), so line N is transcript N as in a
+        # separate scrape of this file; extract_links_robust.py sorts instead
+        urls_out.write_text("\n".join(sources), encoding="utf-8")
+    if sources_out is not None:
+        elr.write_sources(sources_out, sources)
+
+def dedupe_stage(rows, threshold: float, stats: dict):
+    """Drop rows whose transcript is a near-copy of one already passed on."""
+    # Imported here: only --dedupe needs numpy
+    import dedupe_transcripts as dt
+    index = dt.NearDuplicateIndex(threshold)
+    for row in rows:
+        hit = index.check_add(row["index"], row["text"])
+        if hit is not None:
+            stats["duplicates"] += 1
+            print(f"[WARN] {row['url']} is a near-copy ({hit[1]:.2f}) of transcript {hit[0]}; skipped", file=sys.stderr)
+            continue
+        yield row
+
+def fetch_stage(jobs, args, stats: dict, raw_dir: Path = None, combined_out: Path = None, turns_out: Path = None):
+    """Yield scraped rows (with turns); failures are counted and reported."""
+    if args.mode == "http":
+        results = st.iter_http_results(jobs, args.concurrency, args.rate, args.timeout, args.retries,
+                                       args.backoff, out_dir=raw_dir)
+    else:
+        results = st.iter_browser_results(jobs, args.browsers, args.headless, args.timeout, args.retries,
+                                          args.backoff, out_dir=raw_dir)
+    jf = open(combined_out, "w", encoding="utf-8") if combined_out is not None else None
+    tf = open(turns_out, "w", encoding="utf-8") if turns_out is not None else None
+    try:
+        for row, failure in results:
+            if failure is not None:
+                stats["fetch_failed"] += 1
+                print(f"[WARN] Could not fetch {failure['url']}: {failure['error']}", file=sys.stderr)
+                continue
+            stats["fetched"] += 1
+            if jf is not None:
+                jf.write(json.dumps({k: v for k, v in row.items() if k != "turns"}, ensure_ascii=False) + "\n")
+                jf.flush()
+            if tf is not None:
+                # Same record as scrape_transcripts.py writes to turns.jsonl
+                tf.write(json.dumps({"index": row["index"], "url": row["url"], "path": row["path"],
+                                     "turns": row.get("turns", [])}, ensure_ascii=False) + "\n")
+                tf.flush()
+            yield row
+    finally:
+        if jf is not None:
+            jf.close()
+        if tf is not None:
+            tf.close()
+
+def split_stage(rows, stats: dict, user_dir: Path = None):
+    """Yield (user_filename, user_text, row) straight from the in-memory turns."""
+    for row in rows:
+        name = f"{Path(row['path']).stem}_user.txt"
+        with METRICS.timer("split.row", key=name):
+            if row.get("turns"):
+                user_text = sutf.user_text_from_turns(row["turns"])
+            else:
+                user_text = sutf.extract_user_text(row["text"].split("\n"))
+            if user_dir is not None:
+                (user_dir / name).write_text(user_text, encoding="utf-8", errors="ignore")
+        stats["split"] += 1
+        yield name, user_text, row
+
+def link_stage(items, roster, name_col, email_col, scan_lines: int, stats: dict, user_dir: Path = None):
+    """Yield one mapping-CSV row per transcript, in the link_user_transcripts.py column layout plus url."""
+    for name, user_text, row in items:
+        # filepath names the _user.txt file, which only exists under --keep_files
+        filepath = str(user_dir / name) if user_dir is not None else ""
+        with METRICS.timer("link.row", key=name):
+            mapped, _ = lut.link_text(name, filepath, user_text, roster, name_col, email_col, scan_lines)
+        method = mapped["match_method"]
+        stats["matched"] += bool(method)
+        METRICS.count(f"link.match.{method or 'none'}")
+        mapped["url"] = row["url"]
+        yield mapped
+
+# --------------------------
+# Main
+# --------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Submissions ZIP -> share links -> transcripts -> user text -> roster CSV, in one streaming run.")
+    parser.add_argument("--zip", default=DEFAULT_ZIP, help="Submissions ZIP file.")
+    parser.add_argument("--master", default=DEFAULT_MASTER, help="Master roster workbook.")
+    parser.add_argument("--out_csv", default=DEFAULT_OUT_CSV, help="Output mapping CSV.")
+    parser.add_argument("--keep_files", default="", metavar="DIR",
+                        help="Also write urls.txt (line N = transcript N), url_sources.csv, transcripts_raw/, combined.jsonl, turns.jsonl and TXT_users/ under DIR.")
+    parser.add_argument("--extract_workers", type=int, default=elr.DEFAULT_WORKERS, help="Processes parsing ZIP members.")
+    parser.add_argument("--link_cache", default=elr.CACHE_FILE, help="Per-member link cache ('' to disable).")
+    parser.add_argument("--mode", choices=("http", "browser"), default="http",
+                        help="Fetch mode; browser mode collects every link before fetching starts.")
+    parser.add_argument("--concurrency", type=int, default=st.DEFAULT_CONCURRENCY, help="[http] Requests in flight at once.")
+    parser.add_argument("--rate", type=float, default=st.DEFAULT_RATE, help="[http] Max requests per second per host.")
+    parser.add_argument("--browsers", type=int, default=st.DEFAULT_BROWSERS, help="[browser] Chrome instances.")
+    parser.add_argument("--headless", action="store_true", help="[browser] Run Chrome without a window.")
+    parser.add_argument("--timeout", type=float, default=st.DEFAULT_TIMEOUT, help="Seconds per page fetch.")
+    parser.add_argument("--retries", type=int, default=st.DEFAULT_RETRIES, help="Extra attempts per URL.")
+    parser.add_argument("--backoff", type=float, default=st.DEFAULT_BACKOFF, help="Seconds before the first retry.")
+    parser.add_argument("--scan_lines", type=int, default=lut.DEFAULT_SCAN_LINES, help="Lines of user text searched for email/name.")
+    parser.add_argument("--queue_size", type=int, default=DEFAULT_QUEUE_SIZE, help="Records buffered between stages.")
+    parser.add_argument("--dedupe", nargs="?", type=float, const=DEFAULT_DEDUPE_THRESHOLD, default=None, metavar="THRESHOLD",
+                        help="Skip transcripts that are near-copies of an earlier one (word-shingle Jaccard similarity, default 0.85).")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    zpath, master_path = Path(args.zip), Path(args.master)
+    if not zpath.exists():
+        print(f"[ERROR] ZIP not found: {zpath}", file=sys.stderr)
+        sys.exit(1)
+    if not master_path.exists():
+        print(f"[ERROR] Master Excel not found: {master_path}", file=sys.stderr)
+        sys.exit(1)
+
+    with collect_metrics(args, "pipeline"):
+        with METRICS.timer("pipeline.total"):
+            run(args, zpath, master_path)
+
+def run(args, zpath: Path, master_path: Path):
+    keep = Path(args.keep_files) if args.keep_files else None
+    raw_dir = user_dir = urls_out = combined_out = turns_out = sources_out = None
+    if keep is not None:
+        raw_dir, user_dir = keep / "transcripts_raw", keep / "TXT_users"
+        raw_dir.mkdir(parents=True, exist_ok=True)
+        user_dir.mkdir(parents=True, exist_ok=True)
+        urls_out, combined_out, turns_out = keep / st.URLS_FILE, keep / st.COMBINED_FILE, keep / st.TURNS_FILE
+        sources_out = keep / elr.SOURCES_FILE
+
+    # Load the roster first (snapshot-backed) so linking never waits on it
+    with METRICS.timer("link.load_master"):
+        roster, name_col, email_col, _ = lut.load_master(master_path)
+
+    stats = {"links": 0, "fetched": 0, "fetch_failed": 0, "duplicates": 0, "split": 0, "matched": 0}
+    q = args.queue_size
+    links = threaded(links_stage(zpath, args.extract_workers, args.link_cache, stats, urls_out, sources_out), q)
+    rows = threaded(fetch_stage(links, args, stats, raw_dir, combined_out, turns_out), q)
+    if args.dedupe is not None:
+        rows = dedupe_stage(rows, args.dedupe, stats)
+    users = threaded(split_stage(rows, stats, user_dir), q)
+
+    fields = lut.CSV_FIELDS + ["url"]
+    n = 0
+    with open(args.out_csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, lineterminator=os.linesep)
+        writer.writeheader()
+        for out_row in link_stage(users, roster, name_col, email_col, args.scan_lines, stats, user_dir):
+            writer.writerow({k: lut.csv_value(v) for k, v in out_row.items()})
+            n += 1
+
+    for k, v in stats.items():
+        METRICS.count(f"pipeline.{k}", v)
+    print(f"[DONE] {stats['links']} link(s), {stats['fetched']} fetched ({stats['fetch_failed']} failed, "
+          f"{stats['duplicates']} near-duplicate(s)), "
+          f"{stats['split']} split, {stats['matched']} matched; wrote {n} row(s) to: {args.out_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,561 @@
 import time, json, re
+import argparse
+import asyncio
+import queue
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from transcript_store import TranscriptStore
+from metrics import METRICS, add_arguments as add_metrics_arguments, collect as collect_metrics
 
 URLS_FILE = "urls.txt"
 OUT_DIR = Path("transcripts_raw")
-OUT_DIR.mkdir(exist_ok=True)
+COMBINED_FILE = "combined.jsonl"
+FAILED_FILE = "failed.jsonl"   # URLs that still failed after all retries
+TURNS_FILE = "turns.jsonl"     # structured (role, text, ordinal) turns per transcript
+
+# Browser pool defaults
+DEFAULT_BROWSERS = 1
+DEFAULT_TIMEOUT = 25          # seconds to wait for a page's conversation to render
+# Each message in a share page carries its author role; once one is present the
+# conversation has rendered and the page is ready to read.
+TURN_SELECTOR = "[data-message-author-role]"
+
+# Retry defaults: wait BACKOFF, 2*BACKOFF, 4*BACKOFF... seconds between attempts
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 3.0
+
+# Browserless (--mode http) defaults
+DEFAULT_CONCURRENCY = 8       # requests in flight over the pooled connections
+DEFAULT_RATE = 2.0            # max requests per second to any one host (0 = unlimited)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/126.0 Safari/537.36")
+
+# Speaker headings written for structured turns; these are the lines the
+# rendered share page shows and that split_user_texts_fixed.py looks for.
+ROLE_LABELS = {"user": "You said:", "assistant": "ChatGPT said:"}
+NEXT_DATA_RE = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
 
 def slugify(s, maxlen=80):
     s = re.sub(r"[^\w\s-]", "", s).strip()
     s = re.sub(r"[\s_-]+", "-", s)
     return s[:maxlen] if s else "untitled"
 
-def main():
+# --------------------------
+# Browser pool: one Chrome per worker thread
+# --------------------------
+_local = threading.local()
+_drivers = []
+_drivers_lock = threading.Lock()
+
+def make_driver(driver_path: str, headless: bool):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
     options = webdriver.ChromeOptions()
-    options.add_argument("--start-maximized")
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--disable-gpu")
+    else:
+        options.add_argument("--start-maximized")
+    return webdriver.Chrome(service=ChromeService(driver_path), options=options)
+
+def get_driver(driver_path: str, headless: bool):
+    driver = getattr(_local, "driver", None)
+    if driver is None:
+        driver = make_driver(driver_path, headless)
+        _local.driver = driver
+        with _drivers_lock:
+            _drivers.append(driver)
+    return driver
+
+def quit_drivers():
+    with _drivers_lock:
+        for d in _drivers:
+            try:
+                d.quit()
+            except Exception:
+                pass
+        _drivers.clear()
+
+def load_page(driver, url: str, timeout: float) -> str:
+    """Open `url` and return the page source once the conversation turns are present."""
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    driver.get(url)
+    wait = WebDriverWait(driver, timeout)
+    try:
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, TURN_SELECTOR)))
+    except TimeoutException:
+        # Page layout may have changed; keep whatever rendered rather than dropping it
+        print(f"[WARN] No conversation turns after {timeout}s: {url}", file=sys.stderr)
+        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    return driver.page_source
+
+# --------------------------
+# Page parsing
+# --------------------------
+def parse_share_payload(html: str):
+    """
+    Read the conversation embedded in a served share page (Next.js __NEXT_DATA__).
+    Returns (title, [(role, text), ...]) or None if the payload is not there.
+    """
+    m = NEXT_DATA_RE.search(html)
+    if not m:
+        return None
+    try:
+        data = json.loads(m.group(1))["props"]["pageProps"]["serverResponse"]["data"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    nodes = data.get("linear_conversation")
+    if not nodes and data.get("mapping"):
+        # Walk from the current leaf back to the root, then reverse
+        mapping, nodes, cur = data["mapping"], [], data.get("current_node")
+        while cur and cur in mapping:
+            nodes.append(mapping[cur])
+            cur = mapping[cur].get("parent")
+        nodes.reverse()
 
-    urls = [u.strip() for u in open(URLS_FILE, "r", encoding="utf-8") if u.strip()]
-    combined_path = Path("combined.jsonl")
-    if combined_path.exists():
-        combined_path.unlink()
+    turns = []
+    for node in nodes or []:
+        msg = node.get("message") or {}
+        role = (msg.get("author") or {}).get("role")
+        if role not in ROLE_LABELS:
+            continue
+        parts = (msg.get("content") or {}).get("parts") or []
+        text = "\n".join(p for p in parts if isinstance(p, str)).strip()
+        if text:
+            turns.append((role, text))
+    return (data.get("title"), turns) if turns else None
 
-    for i, url in enumerate(urls, 1):
-        driver.get(url)
-        WebDriverWait(driver, 25).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        time.sleep(2)
+def format_turns(turns) -> str:
+    lines = []
+    for role, text in turns:
+        lines.append(ROLE_LABELS[role])
+        lines.append(text)
+    return "\n".join(lines)
 
-        soup = BeautifulSoup(driver.page_source, "lxml")
+def dom_turns(soup):
+    """[(role, text), ...] from the rendered message elements of a share page."""
+    turns = []
+    for el in soup.select(TURN_SELECTOR):
+        role = el.get("data-message-author-role")
+        text = el.get_text("\n", strip=True)
+        if role in ROLE_LABELS and text:
+            turns.append((role, text))
+    return turns
+
+def render_page(i: int, url: str, html: str, use_payload: bool = False, out_dir: Path = OUT_DIR):
+    """
+    Write the transcript text (unless out_dir is None) and return its
+    combined.jsonl row. The row also carries "turns" (popped off before
+    writing combined.jsonl).
+    """
+    payload = parse_share_payload(html) if use_payload else None
+    if payload:
+        title, turns = payload
+        title = title or f"Transcript {i}"
+        text = format_turns(turns)
+    else:
+        soup = BeautifulSoup(html, "lxml")
         title = soup.title.string if soup.title else f"Transcript {i}"
         text = soup.get_text("\n", strip=True)
-
-        fname = f"{i:04d}_{slugify(title)}.txt"
-        out_path = OUT_DIR / fname
+        turns = dom_turns(soup)
+    fname = f"{i:04d}_{slugify(title)}.txt"
+    out_path = (out_dir if out_dir is not None else OUT_DIR) / fname
+    if out_dir is not None:
         out_path.write_text(text, encoding="utf-8")
+    return {"index": i, "url": url, "title": title, "path": str(out_path), "text": text,
+            "turns": [{"ordinal": n, "role": role, "text": t} for n, (role, t) in enumerate(turns)]}
+
+def fetch(job, driver_path: str, headless: bool, timeout: float, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+          out_dir: Path = OUT_DIR):
+    """Return (row, None) on success or (None, failure_record) after the last retry."""
+    i, url = job
+    err = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            with METRICS.timer("scrape.load", key=url):
+                html = load_page(get_driver(driver_path, headless), url, timeout)
+            METRICS.count("scrape.bytes", len(html))
+            with METRICS.timer("scrape.parse", key=url):
+                return render_page(i, url, html, out_dir=out_dir), None
+        except Exception as e:
+            err = e
+            print(f"[WARN] Attempt {attempt + 1}/{retries + 1} failed for {i:04d} {url}: {e}", file=sys.stderr)
+            # A crashed browser would fail every later attempt; start a fresh one
+            _drop_driver()
+    return None, {"index": i, "url": url, "error": str(err), "attempts": retries + 1}
+
+def _drop_driver():
+    driver = getattr(_local, "driver", None)
+    if driver is None:
+        return
+    _local.driver = None
+    with _drivers_lock:
+        if driver in _drivers:
+            _drivers.remove(driver)
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+def iter_browser_results(jobs, browsers: int, headless: bool, timeout: float, retries: int, backoff: float,
+                         out_dir: Path = OUT_DIR):
+    """Yield (row, failure) per job, in job order, from a pool of Chrome instances."""
+    from webdriver_manager.chrome import ChromeDriverManager
+    # Resolve chromedriver once, not once per browser
+    driver_path = ChromeDriverManager().install()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, browsers)) as pool:
+            # map() yields in submission order, so combined.jsonl stays in URL order
+            # even though pages finish out of order
+            yield from pool.map(lambda job: fetch(job, driver_path, headless, timeout, retries, backoff, out_dir), jobs)
+    finally:
+        quit_drivers()
+
+# --------------------------
+# Browserless fetching: asyncio + aiohttp over pooled connections
+# --------------------------
+class HostRateLimiter:
+    """Spaces out requests so no host sees more than `per_sec` per second."""
+
+    def __init__(self, per_sec: float):
+        self.interval = 1.0 / per_sec if per_sec > 0 else 0.0
+        self._next = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, host: str):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next.get(host, 0.0))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+async def _get_page(session, limiter, sem, job, timeout, retries, backoff):
+    """Return (job, html, None) or (job, None, failure_record)."""
+    import aiohttp
+    i, url = job
+    host = urlsplit(url).netloc.lower()
+    err = None
+    delay = 0.0
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(max(delay, backoff * 2 ** (attempt - 1)))
+            delay = 0.0
+        await limiter.wait(host)
+        try:
+            async with sem:
+                t0 = time.perf_counter()
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                    if resp.status in RETRY_STATUS:
+                        err = f"HTTP {resp.status}"
+                        retry_after = resp.headers.get("Retry-After", "")
+                        delay = float(retry_after) if retry_after.isdigit() else 0.0
+                    elif resp.status >= 400:
+                        # Deleted or private share links will not come back on retry
+                        return job, None, {"index": i, "url": url, "error": f"HTTP {resp.status}", "attempts": attempt + 1}
+                    else:
+                        html = await resp.text(errors="ignore")
+                        METRICS.add_time("scrape.download", time.perf_counter() - t0, key=url)
+                        METRICS.count("scrape.bytes", len(html))
+                        return job, html, None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            err = f"{type(e).__name__}: {e}"
+        print(f"[WARN] Attempt {attempt + 1}/{retries + 1} failed for {i:04d} {url}: {err}", file=sys.stderr)
+    return job, None, {"index": i, "url": url, "error": str(err), "attempts": retries + 1}
+
+async def _iter_jobs(jobs):
+    # A list is walked directly; any other iterable (e.g. links still being
+    # extracted upstream) is pulled in a helper thread so the loop never blocks
+    if isinstance(jobs, (list, tuple)):
+        for job in jobs:
+            yield job
+        return
+    loop = asyncio.get_running_loop()
+    it = iter(jobs)
+    end = object()
+    while True:
+        job = await loop.run_in_executor(None, next, it, end)
+        if job is end:
+            return
+        yield job
 
-        row = {"index": i, "url": url, "title": title, "path": str(out_path), "text": text}
-        with open(combined_path, "a", encoding="utf-8") as jf:
+async def _fetch_all_http(jobs, emit, concurrency, rate, timeout, retries, backoff):
+    import aiohttp
+    limiter = HostRateLimiter(rate)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    loop = asyncio.get_running_loop()
+    connector = aiohttp.TCPConnector(limit=max(1, concurrency), ttl_dns_cache=300)
+    headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        # Keep a bounded window of tasks and hand results on strictly in job order
+        window = deque()
+        async for job in _iter_jobs(jobs):
+            window.append(asyncio.ensure_future(_get_page(session, limiter, sem, job, timeout, retries, backoff)))
+            if len(window) >= 2 * concurrency:
+                await loop.run_in_executor(None, emit, await window.popleft())
+            # Pass on finished results without waiting for the next job to arrive
+            while window and window[0].done():
+                await loop.run_in_executor(None, emit, window.popleft().result())
+        while window:
+            await loop.run_in_executor(None, emit, await window.popleft())
+
+def iter_http_results(jobs, concurrency: int, rate: float, timeout: float, retries: int, backoff: float,
+                      out_dir: Path = OUT_DIR):
+    """
+    Yield (row, failure) per job, in job order, fetching share pages without a
+    browser. The event loop runs in a helper thread; pages are parsed and
+    written here so parsing never stalls the downloads.
+    """
+    done = object()
+    results = queue.Queue(maxsize=2 * max(1, concurrency))
+    errors = []
+
+    def runner():
+        try:
+            asyncio.run(_fetch_all_http(jobs, results.put, concurrency, rate, timeout, retries, backoff))
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            results.put(done)
+
+    t = threading.Thread(target=runner, daemon=True)
+    t.start()
+    while True:
+        item = results.get()
+        if item is done:
+            break
+        (i, url), html, failure = item
+        if failure is not None:
+            yield None, failure
+            continue
+        try:
+            with METRICS.timer("scrape.parse", key=url):
+                row = render_page(i, url, html, use_payload=True, out_dir=out_dir)
+        except Exception as e:
+            yield None, {"index": i, "url": url, "error": f"parse: {e}", "attempts": 1}
+            continue
+        yield row, None
+    t.join()
+    if errors:
+        raise errors[0]
+
+# --------------------------
+# Resume support
+# --------------------------
+def read_combined(path: Path):
+    """Rows from an existing combined.jsonl, skipping a torn last line from a crash."""
+    rows = []
+    if not path.exists():
+        return rows
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    return rows
+
+def completed_rows(path: Path):
+    """
+    {url: row} for pages already fetched: the row parsed and its
+    transcripts_raw file is still on disk.
+    """
+    done = {}
+    for row in read_combined(path):
+        p = row.get("path")
+        if row.get("text") and p and Path(p).exists():
+            done[row.get("url")] = row
+    return done
+
+def renumbered_path(path: str, i: int) -> str:
+    """`path` with its NNNN_ index prefix replaced by `i`, as render_page would name it."""
+    p = Path(path)
+    return str(p.with_name(re.sub(r"^\d+_", f"{i:04d}_", p.name)))
+
+def match_by_url(done: dict, jobs):
+    """
+    Line rows from an earlier run ({url: row}) up with this run's jobs by URL,
+    since one new link in the sorted urls.txt shifts every later index.
+    Returns (kept, moved, stale): kept {url: row} for URLs still listed,
+    moved [(row, new_index)] for those now on another line, and stale rows
+    whose URL is gone.
+    """
+    index_of = {}
+    for i, url in jobs:
+        index_of.setdefault(url, i)
+    kept, moved, stale = {}, [], []
+    for url, row in done.items():
+        i = index_of.get(url)
+        if i is None:
+            stale.append(row)
+            continue
+        kept[url] = row
+        if i != row.get("index"):
+            moved.append((row, i))
+    return kept, moved, stale
+
+def carry_over(kept: dict, moved, stale):
+    """Renumber moved rows and rename their transcript files; delete the files of stale rows."""
+    in_use = {row["path"] for row in kept.values()}
+    for row in stale:
+        if row["path"] not in in_use:
+            Path(row["path"]).unlink(missing_ok=True)
+    # Two passes, so no file is renamed onto one that has yet to move
+    for row, _ in moved:
+        Path(row["path"]).replace(row["path"] + ".resume")
+    for row, i in moved:
+        new_path = renumbered_path(row["path"], i)
+        Path(row["path"] + ".resume").replace(new_path)
+        row["index"], row["path"] = i, new_path
+
+def write_jsonl(path: Path, rows):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as jf:
+        for row in rows:
             jf.write(json.dumps(row, ensure_ascii=False) + "\n")
+    tmp.replace(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Save ChatGPT share-link transcripts as text.")
+    parser.add_argument("--urls", default=URLS_FILE, help="File with one share URL per line.")
+    parser.add_argument("--mode", choices=("browser", "http"), default="browser",
+                        help="browser: render pages in Chrome; http: fetch served HTML and read the embedded conversation.")
+    parser.add_argument("--headless", action="store_true", help="Run Chrome without a window.")
+    parser.add_argument("--browsers", type=int, default=DEFAULT_BROWSERS, help="Number of browser instances fetching concurrently.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds to wait for conversation turns to appear.")
+    parser.add_argument("--resume", action="store_true", help="Keep combined.jsonl and skip URLs already fetched successfully.")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Extra attempts per URL before recording it as failed.")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help="Seconds before the first retry; doubles on each further retry.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="[http] Requests in flight at once.")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="[http] Max requests per second per host (0 = unlimited).")
+    parser.add_argument("--store", default="", metavar="DB",
+                        help="Save transcripts into this single-file store instead of transcripts_raw/ and the .jsonl files.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    with collect_metrics(args, "scrape_transcripts"):
+        with METRICS.timer("scrape.total"):
+            run(args)
+
+def run(args):
+    urls = [u.strip() for u in open(args.urls, "r", encoding="utf-8") if u.strip()]
+    jobs = list(enumerate(urls, 1))
+    if args.store:
+        run_into_store(args, jobs)
+        return
+
+    OUT_DIR.mkdir(exist_ok=True)
+    combined_path = Path(COMBINED_FILE)
+    turns_path = Path(TURNS_FILE)
+
+    done = {}
+    if args.resume:
+        done, moved, stale = match_by_url(completed_rows(combined_path), jobs)
+        carry_over(done, moved, stale)
+        # Rewrite without torn lines, stale URLs or rows whose transcript file is gone
+        write_jsonl(combined_path, sorted(done.values(), key=lambda r: r["index"]))
+        turns = {}
+        for r in read_combined(turns_path):
+            row = done.get(r.get("url"))
+            if row is not None:
+                r["index"], r["path"] = row["index"], row["path"]
+                turns[r["url"]] = r
+        write_jsonl(turns_path, sorted(turns.values(), key=lambda r: r["index"]))
+        jobs = [j for j in jobs if j[1] not in done]
+        print(f"Resuming: {len(done)} already fetched ({len(moved)} renumbered, {len(stale)} dropped), {len(jobs)} to go")
+
+    failures = []
+    fetched = 0
+    if not jobs:
+        results = iter(())
+    elif args.mode == "http":
+        results = iter_http_results(jobs, args.concurrency, args.rate, args.timeout, args.retries, args.backoff)
+    else:
+        results = iter_browser_results(jobs, args.browsers, args.headless, args.timeout, args.retries, args.backoff)
+
+    # One buffered handle per output for the whole run, flushed per record so a crash loses at most one row
+    mode = "a" if args.resume else "w"
+    with open(combined_path, mode, encoding="utf-8") as jf, open(turns_path, mode, encoding="utf-8") as tf:
+        for row, failure in results:
+            if failure is not None:
+                failures.append(failure)
+                METRICS.count("scrape.failed")
+                continue
+            METRICS.count("scrape.ok")
+            turns = row.pop("turns", [])
+            tf.write(json.dumps({"index": row["index"], "url": row["url"], "path": row["path"], "turns": turns},
+                                ensure_ascii=False) + "\n")
+            jf.write(json.dumps(row, ensure_ascii=False) + "\n")
+            tf.flush()
+            jf.flush()
+            fetched += 1
+            print(f"Saved {Path(row['path']).name}")
+
+    if done and fetched:
+        # Resumed rows were appended after the earlier ones; restore index order
+        for path in (combined_path, turns_path):
+            write_jsonl(path, sorted(read_combined(path), key=lambda r: r["index"]))
+
+    report_failures(failures)
+
+def run_into_store(args, jobs):
+    """Same run as above, with the store replacing transcripts_raw/, combined.jsonl and turns.jsonl."""
+    # Commit every row, as the folder layout flushes every record
+    with TranscriptStore(args.store, commit_every=1) as store:
+        if args.resume:
+            done, moved, stale = match_by_url(store.done_rows(), jobs)
+            # Also drops any older row that shares a kept row's URL
+            kept = {r["index"] for r in done.values()}
+            store.drop([i for i in store.indices() if i not in kept])
+            store.renumber({r["index"]: (i, renumbered_path(r["path"], i)) for r, i in moved})
+            jobs = [j for j in jobs if j[1] not in done]
+            print(f"Resuming: {len(done)} already fetched ({len(moved)} renumbered, {len(stale)} dropped), {len(jobs)} to go")
+        else:
+            # A fresh run replaces the store's contents, as it would combined.jsonl
+            store.drop(store.indices())
 
-        print(f"Saved {fname}")
+        failures = []
+        if not jobs:
+            results = iter(())
+        elif args.mode == "http":
+            results = iter_http_results(jobs, args.concurrency, args.rate, args.timeout, args.retries, args.backoff,
+                                        out_dir=None)
+        else:
+            results = iter_browser_results(jobs, args.browsers, args.headless, args.timeout, args.retries, args.backoff,
+                                           out_dir=None)
+        for row, failure in results:
+            if failure is not None:
+                failures.append(failure)
+                METRICS.count("scrape.failed")
+                continue
+            METRICS.count("scrape.ok")
+            store.put_raw(row, row.pop("turns", []))
+            print(f"Saved {Path(row['path']).name} to {args.store}")
+    report_failures(failures)
 
-    driver.quit()
+def report_failures(failures):
+    failed_path = Path(FAILED_FILE)
+    if failures:
+        write_jsonl(failed_path, failures)
+        print(f"[WARN] {len(failures)} URL(s) failed after retries; see {failed_path}", file=sys.stderr)
+    elif failed_path.exists():
+        failed_path.unlink()
     print("Done.")
 
 if __name__ == "__main__":
@@ -1,6 +1,15 @@
 from pathlib import Path
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 import re
 import sys
+from transcript_store import TranscriptStore
+from metrics import METRICS, timed, add_arguments as add_metrics_arguments, collect as collect_metrics
 
 # --- Adjust ONLY this base folder if your Desktop path is different ---
 BASE = Path(r"C:\Users\KAFLYNN\Desktop\chatgpt_transcripts")
@@ -8,6 +17,9 @@ BASE = Path(r"C:\Users\KAFLYNN\Desktop\chatgpt_transcripts")
 SRC = BASE / "transcripts_raw"   # your raw transcripts
 OUT = BASE / "TXT_users"         # user-only output (LIWC-ready)
 GLOB = "*.txt"                   # only plain .txt files in SRC (no recursion)
+TURNS = BASE / "turns.jsonl"     # structured turns written by scrape_transcripts.py
+MANIFEST_NAME = ".split_manifest.json"   # kept in OUT for --incremental runs
+DUPES = BASE / "duplicates.csv"  # near-copies flagged by dedupe_transcripts.py
 
 # --- Speaker markers ---
 # Primary pattern: "You said:" (user), "<anything> said:" (agent)
@@ -18,9 +30,20 @@ AGENT_SAID = re.compile(r"^\s*(?!You\b)[\w\s]+said:\s*$", re.IGNORECASE)
 USER_COLON = re.compile(r"^\s*(You|User)\s*:\s*$", re.IGNORECASE)
 AGENT_COLON = re.compile(r"^\s*(Assistant|ChatGPT|AI|Breakeven)\s*:\s*$", re.IGNORECASE)
 
+# All four markers as one regex. User alternatives come first, so a line that
+# fits both (e.g. "  You said:") still counts as user, as with the checks above.
+MARKER = re.compile(
+    r"^\s*(?:(?P<user>You\s+said:|(?:You|User)\s*:)"
+    r"|(?P<agent>(?!You\b)[\w\s]+said:|(?:Assistant|ChatGPT|AI|Breakeven)\s*:))\s*$",
+    re.IGNORECASE,
+)
+
+DEFAULT_WORKERS = 1
+
 def extract_user_text(lines):
     """
-    Extract only the user's text given a list of lines from one transcript.
+    Extract only the user's text given lines from one transcript (any iterable,
+    so an open file can be streamed through it).
     Supports both "... said:" and "User:/Assistant:" styles.
     """
     current = None
@@ -29,62 +52,321 @@ def extract_user_text(lines):
     for raw in lines:
         ln = raw.rstrip("\n\r")
 
-        # Switch on markers (order matters: check for explicit markers first)
-        if USER_SAID.match(ln) or USER_COLON.match(ln):
-            current = "user"
-            continue
-        if AGENT_SAID.match(ln) or AGENT_COLON.match(ln):
-            current = "agent"
-            continue
+        # Every marker ends in ':', so only those lines pay for the regex
+        if ln.rstrip().endswith(":"):
+            m = MARKER.match(ln)
+            if m:
+                current = "user" if m.group("user") is not None else "agent"
+                continue
 
         if current == "user":
             out.append(ln)
 
     return "\n".join(out).strip()
 
-def main():
-    # Make sure folders exist
-    OUT.mkdir(parents=True, exist_ok=True)
-    if not SRC.exists():
-        print(f"[ERROR] Source folder not found: {SRC}", file=sys.stderr)
-        sys.exit(1)
+def count_turns(lines):
+    """(user_turns, agent_turns): the speaker headings extract_user_text switches on."""
+    user = agent = 0
+    for raw in lines:
+        ln = raw.rstrip("\n\r")
+        if ln.rstrip().endswith(":"):
+            m = MARKER.match(ln)
+            if m:
+                if m.group("user") is not None:
+                    user += 1
+                else:
+                    agent += 1
+    return user, agent
 
-    paths = list(SRC.glob(GLOB))
-    if not paths:
-        print(f"[WARN] No .txt files found in: {SRC}")
-        sys.exit(0)
+def read_lines(p: Path):
+    """
+    Stream a transcript's lines. Universal newlines turn CRLF and CR into LF
+    and a leading BOM is dropped, matching the old whole-file normalization.
+    """
+    with open(p, "r", encoding="utf-8", errors="ignore", newline=None) as f:
+        yield from _strip_bom(f)
 
-    total = 0
-    wrote = 0
+def text_lines(text: str):
+    """read_lines for a transcript already in memory (e.g. from a --store)."""
+    return _strip_bom(io.StringIO(text, newline=None))
+
+def _strip_bom(lines):
+    first = True
+    for line in lines:
+        if first:
+            line = line.lstrip("\ufeff")
+            first = False
+        yield line
+
+def split_file(p: Path, out: Path):
+    """Write <stem>_user.txt for one transcript; returns None or a warning message."""
+    try:
+        user_text = extract_user_text(read_lines(p))
+    except Exception as e:
+        return f"Could not read {p}: {e}"
+
+    out_path = out / f"{p.stem}_user.txt"
+    try:
+        out_path.write_text(user_text, encoding="utf-8", errors="ignore")
+    except Exception as e:
+        return f"Could not write {out_path}: {e}"
+    return None
+
+def split_paths(paths, out: Path, workers: int = DEFAULT_WORKERS):
+    """split_file over `paths`, in a process pool when workers > 1; warnings come back in path order."""
+    if workers > 1 and len(paths) > 1:
+        chunksize = max(1, min(64, len(paths) // (workers * 4) or 1))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(timed, [split_file] * len(paths), paths, [out] * len(paths), chunksize=chunksize))
+    else:
+        results = [timed(split_file, p, out) for p in paths]
+    if METRICS.enabled:
+        for p, (_, secs) in zip(paths, results):
+            METRICS.add_time("split.file", secs, key=p.name)
+            METRICS.count("split.bytes", p.stat().st_size)
+    return [warning for warning, _ in results]
+
+# --------------------------
+# Incremental mode: manifest of source size, mtime and content hash
+# --------------------------
+def file_hash(p: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(p, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
+def load_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+def save_manifest(path: Path, manifest: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=0, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+def plan_incremental(paths, out: Path, manifest: dict):
+    """
+    Split `paths` into (changed, unchanged). Size+mtime equal means unchanged;
+    if only mtime moved, the content hash decides (e.g. after a copy or touch).
+    """
+    changed, unchanged = [], []
     for p in paths:
-        if not p.is_file():
-            continue
-        total += 1
+        entry = manifest.get(p.name)
+        st = p.stat()
+        if entry is None or entry.get("size") != st.st_size or not (out / entry.get("output", "")).is_file():
+            changed.append(p)
+        elif entry.get("mtime_ns") == st.st_mtime_ns:
+            unchanged.append(p)
+        elif entry.get("hash") == file_hash(p):
+            entry["mtime_ns"] = st.st_mtime_ns
+            unchanged.append(p)
+        else:
+            changed.append(p)
+    return changed, unchanged
 
+def prune_removed(paths, out: Path, manifest: dict):
+    """Delete outputs (and manifest entries) whose source transcript is gone."""
+    present = {p.name for p in paths}
+    removed = 0
+    for name in [n for n in manifest if n not in present]:
+        target = out / manifest.pop(name).get("output", "")
         try:
-            text = p.read_text(encoding="utf-8", errors="ignore")
+            if target.is_file():
+                target.unlink()
+                removed += 1
         except Exception as e:
-            print(f"[WARN] Could not read {p}: {e}", file=sys.stderr)
-            continue
+            print(f"[WARN] Could not remove {target}: {e}", file=sys.stderr)
+    return removed
 
-        # Normalize newlines and strip BOM if present
-        text = text.replace("\r\n", "\n").replace("\r", "\n")
-        if text.startswith("\ufeff"):
-            text = text.lstrip("\ufeff")
+def split_text(text: str) -> str:
+    return extract_user_text(text_lines(text))
 
-        user_text = extract_user_text(text.split("\n"))
+def split_store(store: TranscriptStore, from_turns: bool, incremental: bool, workers: int = DEFAULT_WORKERS,
+                skip=frozenset()):
+    """Fill in user text for the store's transcripts, except indices in `skip`; returns (total, wrote, skipped)."""
+    for i in skip:
+        # Clearing the user text keeps flagged copies out of linking too
+        store.put_user(i, None)
+    pending = list(store.iter_raw(pending_only=incremental))
+    rows = [r for r in pending if r[0] not in skip]
+    if from_turns:
+        # Stored turns need no regexes; rows scraped without turns (or where the
+        # page showed no message elements, so turns is []) still go through them
+        todo = [(i, text) for i, _, text, turns in rows if not turns]
+        for i, _, _, turns in rows:
+            if turns:
+                store.put_user(i, user_text_from_turns(turns))
+    else:
+        todo = [(i, text) for i, _, text, _ in rows]
+    texts = [text for _, text in todo]
+    if workers > 1 and len(texts) > 1:
+        chunksize = max(1, min(64, len(texts) // (workers * 4) or 1))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(split_text, texts, chunksize=chunksize)
+            for (i, _), user_text in zip(todo, results):
+                store.put_user(i, user_text)
+    else:
+        for i, text in todo:
+            store.put_user(i, split_text(text))
+    METRICS.count("split.files", len(rows))
+    return len(store), len(rows), len(pending) - len(rows)
 
-        out_name = f"{p.stem}_user.txt"
-        out_path = OUT / out_name
+def user_text_from_turns(turns):
+    """
+    Same result as extract_user_text, but from the scraper's structured turns:
+    no marker regexes and no re-read of the raw transcript.
+    """
+    turns = sorted(turns, key=lambda t: t.get("ordinal", 0))
+    return "\n".join(t.get("text", "") for t in turns if t.get("role") == "user").strip()
 
-        try:
-            out_path.write_text(user_text, encoding="utf-8", errors="ignore")
-            wrote += 1
-        except Exception as e:
-            print(f"[WARN] Could not write {out_path}: {e}", file=sys.stderr)
+def split_from_turns(turns_path: Path, out_dir: Path, skip=frozenset()):
+    """Write <stem>_user.txt for every row of a turns.jsonl whose raw file name is not in `skip`; returns (total, wrote)."""
+    total = 0
+    wrote = 0
+    with open(turns_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            total += 1
+            # "path" is the raw transcript; keep its stem so names match the regex path
+            raw_path = Path(str(row.get("path", "")).replace("\\", "/"))
+            if raw_path.name in skip:
+                continue
+            stem = raw_path.stem or f"{row.get('index', total):04d}"
+            out_path = out_dir / f"{stem}_user.txt"
+            if row.get("turns"):
+                user_text = user_text_from_turns(row["turns"])
+            else:
+                # No message elements on the page: fall back to the markers in the raw text
+                try:
+                    user_text = extract_user_text(read_lines(Path(row.get("path", ""))))
+                except Exception as e:
+                    print(f"[WARN] Could not read {row.get('path')}: {e}", file=sys.stderr)
+                    continue
+            try:
+                out_path.write_text(user_text, encoding="utf-8", errors="ignore")
+                wrote += 1
+            except Exception as e:
+                print(f"[WARN] Could not write {out_path}: {e}", file=sys.stderr)
+    return total, wrote
+
+def load_skip(path: Path):
+    """(raw file names, scrape indices) of the near-copies listed in a duplicates.csv."""
+    if not path.exists():
+        print(f"[ERROR] Duplicates file not found: {path}", file=sys.stderr)
+        sys.exit(1)
+    # Read as plain CSV: dedupe_transcripts.py (and numpy) is only needed to write it
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    names = {Path(r["path"].replace("\\", "/")).name for r in rows}
+    indices = {int(r["index"]) for r in rows if str(r.get("index", "")).isdigit()}
+    return names, indices
+
+def main():
+    parser = argparse.ArgumentParser(description="Write user-only text for each raw transcript.")
+    parser.add_argument("--src", default=str(SRC), help="Folder with raw transcript .txt files.")
+    parser.add_argument("--out", default=str(OUT), help="Folder for *_user.txt outputs.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Processes splitting files in parallel (default: 1).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only split new or changed transcripts and remove outputs whose source is gone.")
+    parser.add_argument("--from_turns", nargs="?", const=str(TURNS), default=None, metavar="TURNS_JSONL",
+                        help="Build outputs from the scraper's turns.jsonl (with --store: its stored turns) instead of re-reading transcripts.")
+    parser.add_argument("--skip_duplicates", nargs="?", const=str(DUPES), default=None, metavar="DUPES_CSV",
+                        help="Leave out transcripts that dedupe_transcripts.py flagged as near-copies (and remove their old outputs).")
+    parser.add_argument("--store", default="", metavar="DB",
+                        help="Split transcripts held in this store (see transcript_store.py) and save the user text there.")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    with collect_metrics(args, "split_user_texts_fixed"):
+        with METRICS.timer("split.total"):
+            run(args)
+
+def run(args):
+    skip_names, skip_indices = load_skip(Path(args.skip_duplicates)) if args.skip_duplicates else (set(), set())
+    if args.store:
+        store_path = Path(args.store)
+        if not store_path.exists():
+            print(f"[ERROR] Store not found: {store_path}", file=sys.stderr)
+            sys.exit(1)
+        with TranscriptStore(store_path) as store, METRICS.timer("split.store"):
+            total, wrote, dupes = split_store(store, bool(args.from_turns), args.incremental, args.workers, skip_indices)
+        notes = f", {total - wrote - dupes} already split" if args.incremental else ""
+        if dupes:
+            notes += f", {dupes} near-duplicate(s) skipped"
+        print(f"Processed {total} transcript(s) in {store_path}{notes}; wrote {wrote} user-only text(s)")
+        return
+
+    src, out = Path(args.src), Path(args.out)
+
+    # Make sure folders exist
+    out.mkdir(parents=True, exist_ok=True)
+
+    if args.from_turns:
+        turns_path = Path(args.from_turns)
+        if not turns_path.exists():
+            print(f"[ERROR] Turns file not found: {turns_path}", file=sys.stderr)
+            sys.exit(1)
+        with METRICS.timer("split.from_turns"):
+            total, wrote = split_from_turns(turns_path, out, skip_names)
+        METRICS.count("split.files", wrote)
+        print(f"Processed {total} transcript(s) from {turns_path}; wrote {wrote} user-only file(s) to: {out}")
+        return
+
+    if not src.exists():
+        print(f"[ERROR] Source folder not found: {src}", file=sys.stderr)
+        sys.exit(1)
+
+    paths = [p for p in src.glob(GLOB) if p.is_file()]
+    dupes = [p for p in paths if p.name in skip_names]
+    if dupes:
+        paths = [p for p in paths if p.name not in skip_names]
+        if not args.incremental:
+            # --incremental prunes them with the other outputs whose source is gone
+            for p in dupes:
+                (out / f"{p.stem}_user.txt").unlink(missing_ok=True)
+        print(f"Skipping {len(dupes)} near-duplicate transcript(s) listed in {args.skip_duplicates}")
+        METRICS.count("split.duplicates", len(dupes))
+    if not paths and not args.incremental:
+        print(f"[WARN] No .txt files found in: {src}")
+        sys.exit(0)
+
+    total = len(paths)
+    manifest_path = out / MANIFEST_NAME
+    manifest = load_manifest(manifest_path) if args.incremental else {}
+    if args.incremental:
+        with METRICS.timer("split.plan"):
+            todo, unchanged = plan_incremental(paths, out, manifest)
+            removed = prune_removed(paths, out, manifest)
+        METRICS.count("split.unchanged", len(unchanged))
+    else:
+        todo, unchanged, removed = paths, [], 0
+
+    wrote = 0
+    for p, warning in zip(todo, split_paths(todo, out, args.workers)):
+        if warning:
+            print(f"[WARN] {warning}", file=sys.stderr)
+            manifest.pop(p.name, None)
+            METRICS.count("split.failed")
+            continue
+        wrote += 1
+        METRICS.count("split.files")
+        if args.incremental:
+            st = p.stat()
+            manifest[p.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                "hash": file_hash(p), "output": f"{p.stem}_user.txt"}
 
-    print(f"Processed {total} file(s); wrote {wrote} user-only file(s) to: {OUT}")
+    if args.incremental:
+        save_manifest(manifest_path, manifest)
+        print(f"Processed {total} file(s): {len(unchanged)} unchanged, {len(todo)} new/changed, "
+              f"{removed} stale output(s) removed; wrote {wrote} user-only file(s) to: {out}")
+    else:
+        print(f"Processed {total} file(s); wrote {wrote} user-only file(s) to: {out}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,309 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import split_user_texts_fixed as sutf
+from transcript_store import RAW_DIR, TranscriptStore
+from metrics import METRICS, add_arguments as add_metrics_arguments, collect as collect_metrics
+
+# --------------------------
+# CONFIG DEFAULTS
+# --------------------------
+DEFAULT_INDEX = "transcripts_index.sqlite3"
+DEFAULT_RAW_DIR = RAW_DIR             # scrape_transcripts.py output
+DEFAULT_USER_DIR = sutf.OUT           # split_user_texts_fixed.py output
+DEFAULT_LIMIT = 20
+SNIPPET_TOKENS = 12                   # words of context around each hit
+SOURCES = ("raw", "user")
+
+# docs: one row per indexed transcript file, with the fingerprint used to skip
+# unchanged ones. segs: one row per speaker turn. segs_fts indexes segs.body
+# without a second copy of the text (external content table).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id       INTEGER PRIMARY KEY,
+    source   TEXT NOT NULL,          -- raw | user
+    doc      TEXT NOT NULL,          -- transcript ID: raw file stem, e.g. 0001_Chat-Title
+    size     INTEGER,
+    mtime_ns INTEGER,
+    hash     TEXT,
+    UNIQUE (source, doc)
+);
+CREATE TABLE IF NOT EXISTS segs (
+    id      INTEGER PRIMARY KEY,
+    doc_id  INTEGER NOT NULL,
+    speaker TEXT NOT NULL,           -- user | assistant | '' (raw text before the first heading)
+    ordinal INTEGER NOT NULL,
+    body    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segs_doc ON segs(doc_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS segs_fts USING fts5(
+    body, content='segs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+def speaker_segments(lines):
+    """
+    Yield (speaker, text) turns from a transcript's lines, using the same
+    speaker headings split_user_texts_fixed.py recognizes.
+    """
+    speaker, buf = "", []
+    for raw in lines:
+        ln = raw.rstrip("\n\r")
+        if ln.rstrip().endswith(":"):
+            m = sutf.MARKER.match(ln)
+            if m:
+                text = "\n".join(buf).strip()
+                if text:
+                    yield speaker, text
+                speaker = "user" if m.group("user") is not None else "assistant"
+                buf = []
+                continue
+        buf.append(ln)
+    text = "\n".join(buf).strip()
+    if text:
+        yield speaker, text
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+def doc_id_for(source: str, stem: str) -> str:
+    # TXT_users files are <raw stem>_user.txt; both sources share one transcript ID
+    if source == "user" and stem.endswith("_user"):
+        return stem[:-len("_user")]
+    return stem
+
+def fts_query(text: str, mode: str = "words") -> str:
+    """
+    Turn user input into an FTS5 query. "words": every word must appear (emails
+    and dotted names match as phrases); "phrase": the whole input in order;
+    "fts": passed through as FTS5 syntax (OR, NEAR, prefix*, ...).
+    """
+    if mode == "fts":
+        return text
+    if mode == "phrase":
+        return '"' + text.replace('"', '""') + '"'
+    return " ".join('"' + w.replace('"', '""') + '"' for w in text.split())
+
+class TranscriptIndex:
+    """Incremental FTS5 index over raw and user-only transcripts."""
+
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = Path(path)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    # --- writing ---
+    def _drop_doc(self, doc_rowid: int):
+        # External-content FTS5 needs the old text to remove its postings
+        self.db.executemany(
+            "INSERT INTO segs_fts(segs_fts, rowid, body) VALUES('delete', ?, ?)",
+            self.db.execute("SELECT id, body FROM segs WHERE doc_id = ?", (doc_rowid,)).fetchall())
+        self.db.execute("DELETE FROM segs WHERE doc_id = ?", (doc_rowid,))
+
+    def _put_doc(self, source, doc, size, mtime_ns, digest, lines, existing_rowid=None):
+        if existing_rowid is not None:
+            self._drop_doc(existing_rowid)
+            self.db.execute("UPDATE docs SET size = ?, mtime_ns = ?, hash = ? WHERE id = ?",
+                            (size, mtime_ns, digest, existing_rowid))
+            doc_rowid = existing_rowid
+        else:
+            doc_rowid = self.db.execute(
+                "INSERT INTO docs (source, doc, size, mtime_ns, hash) VALUES (?, ?, ?, ?, ?)",
+                (source, doc, size, mtime_ns, digest)).lastrowid
+        if source == "user":
+            # TXT_users holds only the user's turns, already joined; keep it whole
+            text = "".join(lines).strip()
+            segments = [("user", text)] if text else []
+        else:
+            segments = speaker_segments(lines)
+        for n, (speaker, text) in enumerate(segments):
+            seg = self.db.execute("INSERT INTO segs (doc_id, speaker, ordinal, body) VALUES (?, ?, ?, ?)",
+                                  (doc_rowid, speaker, n, text)).lastrowid
+            self.db.execute("INSERT INTO segs_fts(rowid, body) VALUES (?, ?)", (seg, text))
+
+    def _sync(self, source: str, items):
+        """
+        Bring one source up to date. `items` yields (doc, size, mtime_ns,
+        hash_fn, lines_fn); size+mtime equal skips the doc, otherwise the
+        content hash decides, as in split_user_texts_fixed.py --incremental.
+        Returns (changed, unchanged, removed).
+        """
+        existing = {doc: (rowid, size, mtime, digest) for rowid, doc, size, mtime, digest in
+                    self.db.execute("SELECT id, doc, size, mtime_ns, hash FROM docs WHERE source = ?", (source,))}
+        changed = unchanged = 0
+        seen = set()
+        for doc, size, mtime_ns, hash_fn, lines_fn in items:
+            seen.add(doc)
+            entry = existing.get(doc)
+            if entry is not None and mtime_ns is not None and entry[1] == size and entry[2] == mtime_ns:
+                unchanged += 1
+                continue
+            digest = hash_fn()
+            if entry is not None and entry[3] == digest:
+                self.db.execute("UPDATE docs SET size = ?, mtime_ns = ? WHERE id = ?", (size, mtime_ns, entry[0]))
+                unchanged += 1
+                continue
+            with METRICS.timer(f"index.{source}", key=doc):
+                self._put_doc(source, doc, size, mtime_ns, digest, lines_fn(),
+                              entry[0] if entry is not None else None)
+            changed += 1
+        removed = [entry[0] for doc, entry in existing.items() if doc not in seen]
+        for rowid in removed:
+            self._drop_doc(rowid)
+            self.db.execute("DELETE FROM docs WHERE id = ?", (rowid,))
+        return changed, unchanged, len(removed)
+
+    def update_dir(self, source: str, folder: Path):
+        def items():
+            for p in sorted(folder.glob(sutf.GLOB)):
+                if not p.is_file():
+                    continue
+                s = p.stat()
+                yield (doc_id_for(source, p.stem), s.st_size, s.st_mtime_ns,
+                       lambda p=p: sutf.file_hash(p), lambda p=p: sutf.read_lines(p))
+        with self.db:
+            return self._sync(source, items())
+
+    def update_store(self, store: TranscriptStore):
+        """Index a transcript_store.py database: raw text and, where split, user text."""
+        counts = {}
+        raw = [(Path(p.replace("\\", "/")).stem, text) for _, p, text, _ in store.iter_raw()]
+        users = [(Path(name).stem, text) for _, name, text in store.iter_user()]
+        for source, rows in (("raw", raw), ("user", users)):
+            items = ((doc_id_for(source, stem), len(text), None,
+                      lambda text=text: text_hash(text), lambda text=text: sutf.text_lines(text))
+                     for stem, text in rows)
+            with self.db:
+                counts[source] = self._sync(source, items)
+        return counts
+
+    def optimize(self):
+        with self.db:
+            self.db.execute("INSERT INTO segs_fts(segs_fts) VALUES('optimize')")
+
+    # --- reading ---
+    def search(self, query: str, limit: int = DEFAULT_LIMIT, speaker=None, source=None, mode: str = "words"):
+        """
+        Best-ranked matching turns as dicts: transcript, source, speaker,
+        ordinal, snippet (hits in [brackets]) and score (lower is better).
+        """
+        sql = ("SELECT d.doc, d.source, s.speaker, s.ordinal, "
+               "snippet(segs_fts, 0, '[', ']', '...', ?), bm25(segs_fts) "
+               "FROM segs_fts JOIN segs s ON s.id = segs_fts.rowid JOIN docs d ON d.id = s.doc_id "
+               "WHERE segs_fts MATCH ?")
+        params = [SNIPPET_TOKENS, fts_query(query, mode)]
+        if speaker is not None:
+            sql += " AND s.speaker = ?"
+            params.append(speaker)
+        if source is not None:
+            sql += " AND d.source = ?"
+            params.append(source)
+        sql += " ORDER BY bm25(segs_fts) LIMIT ?"
+        params.append(limit)
+        return [{"transcript": doc, "source": src, "speaker": spk, "ordinal": n,
+                 "snippet": snip.replace("\n", " "), "score": score}
+                for doc, src, spk, n, snip, score in self.db.execute(sql, params)]
+
+    def stats(self) -> dict:
+        out = {src: n for src, n in self.db.execute("SELECT source, COUNT(*) FROM docs GROUP BY source")}
+        out["turns"] = self.db.execute("SELECT COUNT(*) FROM segs").fetchone()[0]
+        return out
+
+def search(query: str, index_path=DEFAULT_INDEX, **kwargs):
+    """One-off query against an index file; see TranscriptIndex.search."""
+    with TranscriptIndex(index_path) as index:
+        return index.search(query, **kwargs)
+
+# --------------------------
+# CLI
+# --------------------------
+def run_update(args):
+    with TranscriptIndex(args.index) as index:
+        if args.store:
+            store_path = Path(args.store)
+            if not store_path.exists():
+                print(f"[ERROR] Store not found: {store_path}", file=sys.stderr)
+                sys.exit(1)
+            with TranscriptStore(store_path) as store:
+                counts = index.update_store(store)
+        else:
+            counts = {}
+            for source, folder in (("raw", Path(args.raw_dir)), ("user", Path(args.user_dir))):
+                if not folder.exists():
+                    print(f"[WARN] {source} folder not found, skipped: {folder}", file=sys.stderr)
+                    continue
+                counts[source] = index.update_dir(source, folder)
+        if args.optimize:
+            index.optimize()
+        for source, (changed, unchanged, removed) in counts.items():
+            METRICS.count(f"index.{source}.changed", changed)
+            print(f"{source}: {changed} new/changed, {unchanged} unchanged, {removed} removed")
+        s = index.stats()
+        print(f"[DONE] Index {args.index}: " + ", ".join(f"{n} {k}" for k, n in s.items()))
+
+def run_search(args):
+    index_path = Path(args.index)
+    if not index_path.exists():
+        print(f"[ERROR] Index not found: {index_path} (run the update command first)", file=sys.stderr)
+        sys.exit(1)
+    try:
+        hits = search(args.query, index_path, limit=args.limit, speaker=args.speaker, source=args.source, mode=args.mode)
+    except sqlite3.OperationalError as e:
+        # Malformed --mode fts syntax
+        print(f"[ERROR] Bad query {args.query!r}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(hits, ensure_ascii=False, indent=2))
+        return
+    for h in hits:
+        print(f"{h['transcript']}\t{h['source']}\t{h['speaker'] or '-'}#{h['ordinal']}\t{h['snippet']}")
+    print(f"[DONE] {len(hits)} hit(s)", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text index over scraped (transcripts_raw) and user-only (TXT_users) transcripts.")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="Index database file.")
+    add_metrics_arguments(parser)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    up = sub.add_parser("update", help="Add new/changed transcripts to the index and drop removed ones.")
+    up.add_argument("--raw_dir", default=str(DEFAULT_RAW_DIR), help="Raw transcripts folder.")
+    up.add_argument("--user_dir", default=str(DEFAULT_USER_DIR), help="User-only transcripts folder.")
+    up.add_argument("--store", default="", metavar="DB", help="Index a transcript_store.py database instead of the folders.")
+    up.add_argument("--optimize", action="store_true", help="Merge index segments afterwards (slower update, faster queries).")
+
+    q = sub.add_parser("search", help="Query the index.")
+    q.add_argument("query", help="Words, an email or a phrase to find.")
+    q.add_argument("--mode", choices=("words", "phrase", "fts"), default="words",
+                   help="words: all words present; phrase: exact sequence; fts: raw FTS5 query syntax.")
+    q.add_argument("--speaker", choices=("user", "assistant"), default=None, help="Only turns by this speaker.")
+    q.add_argument("--source", choices=SOURCES, default=None, help="Only raw or only user-only transcripts.")
+    q.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Max hits.")
+    q.add_argument("--json", action="store_true", help="Print hits as JSON.")
+    args = parser.parse_args()
+
+    with collect_metrics(args, f"transcript_index.{args.command}"):
+        with METRICS.timer(f"index.{args.command}"):
+            if args.command == "update":
+                run_update(args)
+            else:
+                run_search(args)
+
+if __name__ == "__main__":
+    main()
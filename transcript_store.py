@@ -0,0 +1,235 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+# --------------------------
+# CONFIG DEFAULTS
+# --------------------------
+DEFAULT_STORE = "transcripts.sqlite3"
+RAW_DIR = "transcripts_raw"
+USER_DIR = "TXT_users"
+NAMED_DIR = "TXT_users_named"
+COMBINED_FILE = "combined.jsonl"
+TURNS_FILE = "turns.jsonl"
+LINKS_CSV = "transcript_user_links.csv"
+DEFAULT_COMMIT_EVERY = 500     # writes per transaction for bulk stages
+EXPORT_PARTS = ("raw", "combined", "users", "named", "csv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    idx       INTEGER PRIMARY KEY,   -- scrape index (urls.txt line number)
+    url       TEXT NOT NULL,
+    title     TEXT,
+    path      TEXT NOT NULL,         -- transcripts_raw path the folder layout would use
+    raw_text  TEXT,
+    turns     TEXT,                  -- JSON list of {ordinal, role, text}
+    user_text TEXT,                  -- NULL until split
+    link      TEXT                   -- JSON mapping-CSV row, NULL until linked
+);
+CREATE INDEX IF NOT EXISTS transcripts_url ON transcripts(url);
+"""
+
+def user_filename(path: str) -> str:
+    """TXT_users name for a transcript, as split_user_texts_fixed.py writes it."""
+    stem = Path(str(path).replace("\\", "/")).stem
+    return f"{stem}_user.txt"
+
+class TranscriptStore:
+    """
+    One SQLite file holding, per transcript, the raw text and turns, the
+    user-only text and the link result, in place of transcripts_raw/,
+    combined.jsonl, turns.jsonl, TXT_users/ and TXT_users_named/.
+    Rows are keyed by scrape index; writing raw text again clears the
+    user text and link so later stages redo that transcript.
+    """
+
+    def __init__(self, path, commit_every: int = DEFAULT_COMMIT_EVERY):
+        self.path = Path(path)
+        self.commit_every = max(1, commit_every)
+        self._pending = 0
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def _wrote(self, n: int = 1):
+        self._pending += n
+        if self._pending >= self.commit_every:
+            self.db.commit()
+            self._pending = 0
+
+    # --- writers ---
+    def put_raw(self, row: dict, turns=None):
+        """Store one scraped row (index, url, title, path, text) and its turns."""
+        self.db.execute(
+            "INSERT INTO transcripts (idx, url, title, path, raw_text, turns) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(idx) DO UPDATE SET url=excluded.url, title=excluded.title, path=excluded.path, "
+            "raw_text=excluded.raw_text, turns=excluded.turns, user_text=NULL, link=NULL",
+            (row["index"], row["url"], row.get("title"), row["path"], row.get("text", ""),
+             json.dumps(turns, ensure_ascii=False) if turns is not None else None))
+        self._wrote()
+
+    def put_user(self, idx: int, user_text: str):
+        self.db.execute("UPDATE transcripts SET user_text = ?, link = NULL WHERE idx = ?", (user_text, idx))
+        self._wrote()
+
+    def put_link(self, idx: int, mapped: dict):
+        # Roster cells may be numpy scalars; store them as the CSV would print them
+        self.db.execute("UPDATE transcripts SET link = ? WHERE idx = ?", (json.dumps(mapped, ensure_ascii=False, default=str), idx))
+        self._wrote()
+
+    def drop(self, indices):
+        self.db.executemany("DELETE FROM transcripts WHERE idx = ?", [(i,) for i in indices])
+        self._wrote(len(indices))
+
+    def renumber(self, moves: dict):
+        """
+        moves: {old_index: (new_index, new_path)}. Rows keep their raw and user
+        text; the link is cleared, since it names the old user file.
+        """
+        # Park the rows on negative indices first so no move collides with a row yet to move
+        self.db.executemany("UPDATE transcripts SET idx = ?, path = ?, link = NULL WHERE idx = ?",
+                            [(-new, path, old) for old, (new, path) in moves.items()])
+        self.db.execute("UPDATE transcripts SET idx = -idx WHERE idx < 0")
+        self._wrote(len(moves))
+
+    # --- readers ---
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def indices(self):
+        return [i for (i,) in self.db.execute("SELECT idx FROM transcripts ORDER BY idx")]
+
+    def done_rows(self):
+        """
+        {url: row} for transcripts already scraped (row as in combined.jsonl).
+        Rows without text are left out so a resume refetches them, as the
+        folder resume does.
+        """
+        cur = self.db.execute("SELECT idx, url, title, path FROM transcripts WHERE raw_text <> '' ORDER BY idx")
+        return {u: {"index": i, "url": u, "title": t, "path": p} for i, u, t, p in cur}
+
+    def iter_raw(self, pending_only: bool = False):
+        """Yield (index, path, raw_text, turns) in index order; pending_only skips rows already split."""
+        sql = "SELECT idx, path, raw_text, turns FROM transcripts"
+        if pending_only:
+            sql += " WHERE user_text IS NULL"
+        for i, p, text, turns in self.db.execute(sql + " ORDER BY idx").fetchall():
+            yield i, p, text or "", json.loads(turns) if turns else None
+
+    def iter_user(self, pending_only: bool = False):
+        """Yield (index, user_filename, user_text) for split transcripts, in filename order."""
+        sql = "SELECT idx, path, user_text FROM transcripts WHERE user_text IS NOT NULL"
+        if pending_only:
+            sql += " AND link IS NULL"
+        rows = [(i, user_filename(p), t) for i, p, t in self.db.execute(sql).fetchall()]
+        # Same order link_user_transcripts.py walks TXT_users in
+        rows.sort(key=lambda r: r[1])
+        return iter(rows)
+
+    def iter_links(self):
+        """Yield (index, mapped_row) for linked transcripts, in filename order."""
+        rows = [(i, json.loads(link)) for i, link in
+                self.db.execute("SELECT idx, link FROM transcripts WHERE link IS NOT NULL").fetchall()]
+        rows.sort(key=lambda r: r[1].get("filename", ""))
+        return iter(rows)
+
+# --------------------------
+# Exporter: regenerate the folder layout from a store
+# --------------------------
+def export_store(store: TranscriptStore, base: Path, parts=EXPORT_PARTS):
+    """Write the requested parts of the old folder layout under `base`; returns {part: count}."""
+    counts = dict.fromkeys(parts, 0)
+    raw_dir, user_dir, named_dir = base / RAW_DIR, base / USER_DIR, base / NAMED_DIR
+    for d, part in ((raw_dir, "raw"), (user_dir, "users"), (named_dir, "named")):
+        if part in parts:
+            d.mkdir(parents=True, exist_ok=True)
+
+    if "raw" in parts or "combined" in parts:
+        jf = tf = None
+        if "combined" in parts:
+            jf = open(base / COMBINED_FILE, "w", encoding="utf-8")
+            tf = open(base / TURNS_FILE, "w", encoding="utf-8")
+        try:
+            for i, url, title, path, text, turns in store.db.execute(
+                    "SELECT idx, url, title, path, raw_text, turns FROM transcripts ORDER BY idx"):
+                out_path = raw_dir / Path(path.replace("\\", "/")).name
+                if "raw" in parts:
+                    out_path.write_text(text or "", encoding="utf-8")
+                    counts["raw"] += 1
+                if jf is not None:
+                    row = {"index": i, "url": url, "title": title, "path": str(out_path), "text": text or ""}
+                    jf.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    tf.write(json.dumps({"index": i, "url": url, "path": str(out_path),
+                                         "turns": json.loads(turns) if turns else []}, ensure_ascii=False) + "\n")
+                    counts["combined"] += 1
+        finally:
+            if jf is not None:
+                jf.close()
+                tf.close()
+
+    if "users" in parts or "named" in parts:
+        named = {}
+        if "named" in parts:
+            named = {i: m.get("renamed_file") for i, m in store.iter_links() if m.get("renamed_file")}
+        for i, name, text in store.iter_user():
+            if "users" in parts:
+                (user_dir / name).write_text(text, encoding="utf-8", errors="ignore")
+                counts["users"] += 1
+            if i in named:
+                (named_dir / named[i]).write_text(text, encoding="utf-8", errors="ignore")
+                counts["named"] += 1
+
+    if "csv" in parts:
+        links = [m for _, m in store.iter_links()]
+        if links:
+            with open(base / LINKS_CSV, "w", encoding="utf-8", newline="") as f:
+                # Every row of one run has the same columns, in link_user_transcripts.py order
+                writer = csv.DictWriter(f, fieldnames=list(links[0]), lineterminator=os.linesep, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(links)
+            counts["csv"] = len(links)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the transcript folder layout from a --store database.")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="Store file written by the scrape/split/link scripts.")
+    parser.add_argument("--out", default=".", help="Base folder to write transcripts_raw/, TXT_users/, etc. into.")
+    parser.add_argument("--parts", default=",".join(EXPORT_PARTS),
+                        help=f"Comma-separated parts to export (default: all of {','.join(EXPORT_PARTS)}).")
+    args = parser.parse_args()
+
+    store_path = Path(args.store)
+    if not store_path.exists():
+        print(f"[ERROR] Store not found: {store_path}", file=sys.stderr)
+        sys.exit(1)
+    parts = tuple(p.strip() for p in args.parts.split(",") if p.strip())
+    unknown = [p for p in parts if p not in EXPORT_PARTS]
+    if unknown:
+        print(f"[ERROR] Unknown part(s): {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(1)
+
+    base = Path(args.out)
+    base.mkdir(parents=True, exist_ok=True)
+    with TranscriptStore(store_path) as store:
+        counts = export_store(store, base, parts)
+    print(f"[DONE] Exported to {base}: " + ", ".join(f"{n} {part}" for part, n in counts.items()))
+
+if __name__ == "__main__":
+    main()